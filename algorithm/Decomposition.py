@@ -0,0 +1,210 @@
+import os
+import copy
+import math
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.cluster import KMeans
+
+from model import Population, Individual
+from utils import Geo
+
+
+def solve_sector(parameters, instance, seed):
+    """
+    Solve the subproblem of a sector in a worker process with its own population and return the compact routes of the
+    best individual that serves every customer of the sector (or of the best one if none of them does)
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    population = Population(parameters, instance)
+    population.construct()
+    customers = len(instance.nodes_df) - 1
+    complete_individuals = [individual for individual in population.individuals if sum(len(route.tour) - 2 for route in individual.routes) == customers]
+    best_individual = min(complete_individuals, key=lambda individual: individual.fitness) if complete_individuals else population.best_individual
+    return best_individual.get_compact_routes(), best_individual.fitness
+
+
+class Decomposition:
+    """
+    Regional decomposition of the CVRP: the customers are split into geographic sectors, every sector receives a share
+    of the fleet proportional to its demand and is solved as an independent CVRP in its own process. The routes of the
+    sectors are stitched into one Individual and a short inter-route search repairs the borders between sectors.
+
+    Modes ('decomposition_mode' parameter):
+    region -- One sector per autonomous community (CODAUTO)
+    province -- One sector per province
+    angular -- 'decomposition_sectors' angular sectors around the depot with the same demand
+    kmeans -- 'decomposition_sectors' K-Means clusters of the projected coordinates
+    """
+    def __init__(self, parameters, instance):
+        self.Geo = Geo()
+        self.parameters = parameters
+        self.instance = instance
+        self.sectors = list()
+
+
+    def solve(self):
+        """
+        Solve every sector and return the stitched Individual
+        """
+        self.sectors, fleets = self.merge_sectors(self.create_sectors())
+        print("Decomposition:", self.parameters.decomposition_mode, "-", len(self.sectors), "sectors with", [len(fleet) for fleet in fleets], "vehicles")
+
+        workers = self.get_workers()
+        sector_parameters = self.create_sector_parameters(workers)
+        subproblems = [self.instance.create_sub_instance(node_ids, fleet) for node_ids, fleet in zip(self.sectors, fleets)]
+        seeds = [self.parameters.random_seed + sector for sector in range(len(subproblems))]
+
+        routes = dict()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(solve_sector, sector_parameters, sub_instance, seed) for (sub_instance, _, _), seed in zip(subproblems, seeds)]
+            for sector, (future, (_, node_ids, vehicle_ids)) in enumerate(zip(futures, subproblems)):
+                compact_routes, fitness = future.result()
+                print('End Sector:', sector, ' Customers:', len(node_ids) - 1, ' FITNESS:', fitness)
+                # Back to the node and vehicle ids of the whole instance
+                for vehicle_id, tour in compact_routes:
+                    routes[int(vehicle_ids[vehicle_id])] = node_ids[tour[1:-1]].tolist()
+
+        routed_nodes = {node_id for tour in routes.values() for node_id in tour}
+        unassigned_nodes = {node_id for node_ids in self.sectors for node_id in node_ids.tolist()} - routed_nodes
+        if unassigned_nodes:
+            print(f"Warning: Not all nodes were assigned to a route. Unassigned nodes: {unassigned_nodes}")
+
+        individual = Individual(self.parameters, self.instance)
+        individual.create_routes_object(routes)
+        print('Stitched FITNESS:', sum(route.fitness for route in individual.routes))
+        individual.improve_routes(self.parameters.decomposition_repair_time)
+        print('Repaired FITNESS:', individual.fitness)
+        return individual
+
+
+    def create_sectors(self):
+        """
+        Split the customers into sectors with the method of the 'decomposition_mode' parameter
+
+        Output:
+            - List of arrays of customer ids, one per non empty sector
+        """
+        client_nodes = self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']
+        client_ids = client_nodes['Id'].to_numpy()
+        mode = self.parameters.decomposition_mode
+        if mode == 'region':
+            labels = client_nodes['Region_Id'].factorize()[0]
+        elif mode == 'province':
+            labels = client_nodes['Province'].factorize()[0]
+        elif mode == 'angular':
+            labels = self.get_angular_sectors(client_nodes)
+        elif mode == 'kmeans':
+            coordinates = self.Geo.project_coordinates(client_nodes['Latitude'].values, client_nodes['Longitude'].values)
+            n_sectors = min(self.parameters.decomposition_sectors, len(client_ids))
+            labels = KMeans(n_clusters=n_sectors, random_state=self.parameters.random_seed).fit_predict(coordinates)
+        else:
+            raise ValueError(f"Unknown decomposition mode: {mode}")
+        return [client_ids[labels == label] for label in np.unique(labels)]
+
+
+    def get_angular_sectors(self, client_nodes):
+        """
+        Cut the customers sorted by their bearing from the depot into 'decomposition_sectors' sectors with the same demand.
+        The first cut is placed in the widest angular gap between consecutive customers.
+        """
+        depot = self.instance.nodes_df[self.instance.nodes_df['Node_Type'] == 'Depot'].iloc[0]
+        depot_coordinates = np.array([depot['Latitude'], depot['Longitude']], dtype=np.float64)
+        coordinates = client_nodes[['Latitude', 'Longitude']].to_numpy(dtype=np.float64)
+        bearings = self.Geo.calculate_bearings(depot_coordinates, coordinates)
+
+        order = np.argsort(bearings, kind='stable')
+        gaps = np.diff(np.append(bearings[order], bearings[order[0]] + 2 * np.pi))
+        order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+
+        demands = client_nodes['Items'].to_numpy(dtype=np.float64)[order]
+        n_sectors = min(self.parameters.decomposition_sectors, len(order))
+        cumulative_demand = np.cumsum(demands) - demands / 2
+        labels = np.zeros(len(order), dtype=np.int64)
+        labels[order] = np.minimum((cumulative_demand / demands.sum() * n_sectors).astype(np.int64), n_sectors - 1)
+        return labels
+
+
+    def merge_sectors(self, sectors):
+        """
+        Merge the sector with the lowest demand into the sector with the closest centroid until the fleet can cover
+        the demand of every sector (e.g. provinces with a few customers)
+
+        Output:
+            - (List of sectors, list of fleet dataframes, one per sector)
+        """
+        node_store = self.instance.node_store
+        coordinates = self.Geo.project_coordinates(node_store.latitude, node_store.longitude)
+        sectors = list(sectors)
+        fleets = self.allocate_fleet(sectors)
+        while fleets is None:
+            demands = np.array([node_store.items[node_store.positions[node_ids]].sum() for node_ids in sectors], dtype=np.float64)
+            centroids = np.array([coordinates[node_store.positions[node_ids]].mean(axis=0) for node_ids in sectors])
+            smallest = int(np.argmin(demands))
+            distances = np.linalg.norm(centroids - centroids[smallest], axis=1)
+            distances[smallest] = np.inf
+            closest = int(np.argmin(distances))
+            sectors[closest] = np.concatenate((sectors[closest], sectors[smallest]))
+            del sectors[smallest]
+            fleets = self.allocate_fleet(sectors)
+        return sectors, fleets
+
+
+    def allocate_fleet(self, sectors):
+        """
+        Share the fleet between the sectors by capacity: the vehicles are given from the largest to the smallest, each
+        one to the sector with the largest demand not covered yet. Once every demand is covered, the spare vehicles go
+        to the sector with the highest demand to capacity ratio.
+
+        Output:
+            - List of fleet dataframes, one per sector, or None if the vehicles can not cover every sector.
+              Raises ValueError if the capacity of the fleet is smaller than the demand.
+        """
+        fleet_df = self.instance.fleet_df
+        node_store = self.instance.node_store
+        demands = np.array([node_store.items[node_store.positions[node_ids]].sum() for node_ids in sectors], dtype=np.float64)
+        capacities = fleet_df['Capacity'].to_numpy(dtype=np.float64)
+        if capacities.sum() < demands.sum():
+            raise ValueError(f"The fleet capacity {capacities.sum()} is smaller than the demand {demands.sum()}")
+
+        sector_capacities = np.zeros(len(sectors), dtype=np.float64)
+        sector_vehicles = [list() for _ in sectors]
+        for vehicle in np.argsort(-capacities, kind='stable'):
+            deficits = demands - sector_capacities
+            if np.any(deficits > 0):
+                sector = int(np.argmax(deficits))
+            else:
+                sector = int(np.argmax(demands / sector_capacities))
+            sector_vehicles[sector].append(vehicle)
+            sector_capacities[sector] += capacities[vehicle]
+        if np.any(sector_capacities < demands):
+            return None
+        return [fleet_df.iloc[sorted(vehicles)] for vehicles in sector_vehicles]
+
+
+    def create_sector_parameters(self, workers):
+        """
+        Parameters of the sector populations: smaller populations solved sequentially inside each sector process,
+        with the share of the time budget of a wave of 'workers' sectors
+        """
+        sector_parameters = copy.copy(self.parameters)
+        sector_parameters.TAM_POPULATION = self.parameters.decomposition_population_size
+        sector_parameters.population_workers = 1
+        sector_parameters.route_workers = 1
+        sector_parameters.or_tools_portfolio = False
+        if self.parameters.time_budget_seconds > 0:
+            waves = math.ceil(len(self.sectors) / workers)
+            sector_parameters.time_budget_seconds = max(1.0, (self.parameters.time_budget_seconds - self.parameters.decomposition_repair_time) / waves)
+        return sector_parameters
+
+
+    def get_workers(self):
+        """
+        Number of sectors solved at the same time. 0 in the 'population_workers' parameter uses every core
+        """
+        workers = self.parameters.population_workers
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return max(1, min(workers, len(self.sectors)))
+
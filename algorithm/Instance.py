@@ -1,6 +1,10 @@
-from utils import IO, Geo
+import copy
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
 
-from scipy.spatial.distance import cdist
+import model
+from utils import IO, Geo, MatrixCache, DistanceMatrix, SharedArrays, RouteCache, InstanceSnapshot
 
 class Instance:
 
@@ -8,9 +12,15 @@ class Instance:
         self.IO = IO()
         self.Geo = Geo()
         self.parameters = parameters
-        self.nodes_df = self.create_nodes_info()
-        self.fleet_df = self.create_fleet_info()
-        self.distance_matrix = self.create_distance_matrix()
+        self.candidate_lists = dict()
+        self.shared_arrays = None
+        self.route_cache = RouteCache(parameters.route_cache_size)
+        if not self.load_snapshot():
+            self.nodes_df = self.create_nodes_info()
+            self.node_store = model.NodeStore(parameters, self, self.nodes_df)
+            self.fleet_df = self.create_fleet_info()
+            self.distance_matrix = self.create_distance_matrix()
+            self.save_snapshot()
 
     def create_nodes_info(self):
         """
@@ -22,45 +32,38 @@ class Instance:
         not_included_regions = [4, 5, 18, 19] #Canarias, baleares, ceuta y melilla
         input_df = self.IO.read_csv(file_path=self.parameters.input_file_path + self.parameters.input_file_name, separator=',', decimal='.', encoding='utf-8')
 
-        node_list = list()
-        node_counter = 0
+        # Customers with demand outside the not included regions, up to 'max_nodes' (0 keeps all of them)
+        input_df = input_df[(input_df['NCAMAS'] != 0) & ~input_df['CODAUTO'].isin(not_included_regions)]
+        if self.parameters.max_nodes > 0:
+            input_df = input_df.head(self.parameters.max_nodes)
+
+        # Phones are numbers read as float, the ones that are not numbers are left empty
+        phones = pd.to_numeric(input_df['TELEFONO'], errors='coerce').astype('Int64').astype('string').fillna('').astype(str)
+
+        nodes_df = pd.DataFrame({
+            'Id': np.arange(1, len(input_df) + 1),
+            'Name': input_df['NOMBRE'].values,
+            'Address': input_df['DIRECCION'].values,
+            'Location': input_df['MUNICIPIOS'].values,
+            'Province': input_df['PROVINCIAS'].values,
+            'Zip_Code': input_df['CODPOSTAL'].values,
+            'Items': input_df['NCAMAS'].values,
+            'Weight': np.round(input_df['NCAMAS'].to_numpy(dtype=np.int64) * 120.56, 2),
+            'Node_Type': input_df['FINALIDAD_ASISITENCIAL'].values,
+            'TW_Start': '03:00',
+            'TW_End': '23:59',
+            'Latitude': input_df['Y'].values,
+            'Longitude': input_df['X'].values,
+            'Email': input_df['EMAIL'].values,
+            'Phone': phones.values,
+            'Region_Id': input_df['CODAUTO'].to_numpy(dtype=np.int64),
+        })
 
         # Add depot
-        node_object = [node_counter, 'Depot', 'C. Tajo, s/n', 'Villaviciosa de Odon', 'MADRID', '28670', 0, 0, 'Depot', '00:00', '00:00', 40.37387062578713, -3.919575039549291, '', '']
-        node_list.append(node_object)
-    
-        for index, node in input_df.iterrows():     
-            node_name = node['NOMBRE']
-            address = node['DIRECCION']
-            location = node['MUNICIPIOS']
-            province = node['PROVINCIAS']
-            zip_code = node['CODPOSTAL']
-            items = node['NCAMAS']
-            if items == 0:
-                continue
-            weight = round(int(items) * 120.56, 2)
-            node_type = node['FINALIDAD_ASISITENCIAL']
-            tw_start = '03:00'
-            tw_end = '23:59'
-            latitude = node['Y']
-            longitude = node['X']
-            email = node['EMAIL']
-            try:
-                phone = str(int(node['TELEFONO']))
-            except ValueError as e:
-                phone = ''
-            region_id = int(node['CODAUTO'])
-
-            if node_counter > 800: # COMMENT
-                break
-
-            if not region_id in not_included_regions:
-                node_counter = node_counter + 1
-                node_object = [node_counter, node_name, address, location, province, zip_code, items, weight, node_type, tw_start, tw_end, latitude, longitude, email, phone]
-                node_list.append(node_object)
-                
-        columns_name = ['Id', 'Name', 'Address', 'Location' , 'Province', 'Zip_Code', 'Items', 'Weight', 'Node_Type', 'TW_Start', 'TW_End', 'Latitude', 'Longitude', 'Email', 'Phone']
-        nodes_df = self.IO.create_CSV_from_list(node_list, columns_name, 'input_files/nodes')
+        depot_df = pd.DataFrame([[0, 'Depot', 'C. Tajo, s/n', 'Villaviciosa de Odon', 'MADRID', '28670', 0, 0, 'Depot', '00:00', '00:00', 40.37387062578713, -3.919575039549291, '', '', 13]],
+                                columns=nodes_df.columns)
+        nodes_df = pd.concat([depot_df, nodes_df], ignore_index=True)
+        self.IO.create_csv_if_changed(nodes_df, 'input_files/nodes')
         return nodes_df
     
 
@@ -76,14 +79,271 @@ class Instance:
     
 
     # Function to create a distance matrix using geodesic distance
-    def create_distance_matrix(self):
+    def create_distance_matrix(self, block_size=512):
         """
         Creates the distance matrix between all pairs of nodes.
+        The distance backend is selected with the 'distance_mode' parameter (haversine, vincenty or geodesic)
+        and the storage with 'distance_matrix_storage' (dense float64, integer or condensed uint16).
+        The matrix is built by blocks of rows, so the compact storages never hold the dense float64 matrix.
         """
+        coordinates = self.nodes_df[['Latitude', 'Longitude']].values.astype(np.float64)
+        storage = self.parameters.distance_matrix_storage
+        cache_mode = self.parameters.distance_mode + '_' + storage
+
+        # Reuse the matrix stored in a previous run if the nodes have not changed
+        cached_matrix, cached_indices = None, None
+        if self.parameters.use_distance_cache:
+            matrix_cache = MatrixCache(self.parameters.output_file_path + 'cache/')
+            key = matrix_cache.create_key(coordinates, cache_mode)
+            data = matrix_cache.load(key)
+            if data is not None:
+                print("Loading distance matrix from cache...")
+                return self.wrap_distance_matrix(data, len(coordinates), storage)
+
+            cached_data, cached_coordinates = matrix_cache.find_closest_entry(coordinates, cache_mode)
+            if cached_data is not None:
+                cached_matrix = self.wrap_distance_matrix(cached_data, len(cached_coordinates), storage)
+                cached_positions = {coordinate: index for index, coordinate in enumerate(map(tuple, cached_coordinates))}
+                cached_indices = np.array([cached_positions.get(coordinate, -1) for coordinate in map(tuple, coordinates)], dtype=np.int64)
+                print("Reusing", int((cached_indices >= 0).sum()), "cached nodes, calculating", int((cached_indices < 0).sum()), "changed nodes...")
+
         print("Creating distance matrix...")
-        coordinates = self.nodes_df[['Latitude', 'Longitude']].values
-        def dist_func(u, v):
-            return self.Geo.calculate_distance((u[0], u[1]), (v[0], v[1]))
-        distance_matrix = cdist(coordinates, coordinates, metric=dist_func)
+        size = len(coordinates)
+        distance_matrix = np.zeros((size, size)) if storage == 'dense' else DistanceMatrix(size, storage)
+        for start in range(0, size, block_size):
+            end = min(start + block_size, size)
+            # Distances are symmetric, so only rows start:end against columns start:N are calculated
+            block = self.calculate_distance_block(coordinates, start, end, cached_matrix, cached_indices)
+            if storage == 'dense':
+                distance_matrix[start:end, start:] = block
+                distance_matrix[start:, start:end] = block.T
+            else:
+                distance_matrix.set_block(start, end, block)
+
+        if self.parameters.use_distance_cache:
+            matrix_cache.save(key, distance_matrix if storage == 'dense' else distance_matrix.data, coordinates)
         return distance_matrix
-    
+
+
+    def calculate_distance_block(self, coordinates, start, end, cached_matrix=None, cached_indices=None):
+        """
+        Calculates the distances between rows start:end and columns start:N. When a cached matrix is given the
+        distances between nodes whose coordinates have not changed are copied from it instead of calculated.
+        """
+        mode = self.parameters.distance_mode
+        if cached_matrix is None:
+            return self.Geo.calculate_distance_matrix(coordinates[start:end], coordinates[start:], mode=mode)
+
+        rows = cached_indices[start:end]
+        columns = cached_indices[start:]
+        reused_rows = rows >= 0
+        reused_columns = columns >= 0
+        block = np.zeros((len(rows), len(columns)))
+        block[np.ix_(reused_rows, reused_columns)] = cached_matrix[np.ix_(rows[reused_rows], columns[reused_columns])]
+        if (~reused_rows).any():
+            block[~reused_rows, :] = self.Geo.calculate_distance_matrix(coordinates[start:end][~reused_rows], coordinates[start:], mode=mode)
+        if reused_rows.any() and (~reused_columns).any():
+            block[np.ix_(reused_rows, ~reused_columns)] = self.Geo.calculate_distance_matrix(coordinates[start:end][reused_rows], coordinates[start:][~reused_columns], mode=mode)
+        return block
+
+
+    def wrap_distance_matrix(self, data, size, storage):
+        """
+        Returns the stored data of a distance matrix with the accessor of its storage
+        """
+        if storage == 'dense':
+            return data
+        return DistanceMatrix(size, storage, data)
+
+
+    def get_condensed_distance_matrix(self, indices):
+        """
+        Condensed upper triangle of the distances between the given node indices (scipy squareform format),
+        read pair by pair so the (len(indices), len(indices)) submatrix is never copied.
+        """
+        indices = np.asarray(indices)
+        first, second = np.triu_indices(len(indices), 1)
+        return np.asarray(self.distance_matrix[indices[first], indices[second]], dtype=np.float64)
+
+
+    def get_node_candidates(self, percentage=None, k=None):
+        """
+        Returns the candidate lists of every node: row i holds the k nearest nodes to node i (node i included)
+        sorted by distance. The size can be given as a number of nodes (k) or as a percentage of all nodes.
+        The index is built once per size and shared by every heuristic and local search operator.
+
+        Output:
+            - (N, k) array of node ids
+        """
+        size = len(self.nodes_df)
+        if k is None:
+            k = int(size * (percentage / 100))
+        k = max(1, min(k, size))
+
+        if k not in self.candidate_lists:
+            # A longer candidate list already holds the shorter one in its first columns
+            larger_sizes = [candidates_size for candidates_size in self.candidate_lists if candidates_size > k]
+            if larger_sizes:
+                self.candidate_lists[k] = self.candidate_lists[min(larger_sizes)][:, :k]
+            else:
+                self.candidate_lists[k] = self.create_candidate_index(k)
+        return self.candidate_lists[k]
+
+
+    def create_candidate_index(self, k, block_size=512):
+        """
+        Creates the k nearest neighbours of every node with the method given in the 'candidates_method' parameter:
+        'matrix' selects them from the distance matrix rows with argpartition,
+        'balltree' queries a BallTree over haversine coordinates without reading the distance matrix.
+        """
+        if self.parameters.candidates_method == 'balltree':
+            coordinates = np.radians(self.nodes_df[['Latitude', 'Longitude']].values.astype(np.float64))
+            tree = BallTree(coordinates, metric='haversine')
+            _, candidates = tree.query(coordinates, k=k)
+            return candidates
+
+        size = len(self.nodes_df)
+        candidates = np.zeros((size, k), dtype=np.int64)
+        for start in range(0, size, block_size):
+            end = min(start + block_size, size)
+            distances = np.asarray(self.distance_matrix[start:end])
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1, kind='stable')
+            candidates[start:end] = np.take_along_axis(nearest, order, axis=1)
+        return candidates
+
+
+    def get_snapshot_key(self, instance_snapshot):
+        """
+        Key of the snapshot of this instance: the input files and the parameters used to build it
+        """
+        file_paths = [self.parameters.input_file_path + self.parameters.input_file_name, self.parameters.input_file_path + self.parameters.fleet_file_name]
+        settings = {
+            'max_nodes': self.parameters.max_nodes,
+            'distance_mode': self.parameters.distance_mode,
+            'distance_matrix_storage': self.parameters.distance_matrix_storage,
+            'candidates_method': self.parameters.candidates_method,
+        }
+        return instance_snapshot.create_key(file_paths, settings)
+
+
+    def load_snapshot(self):
+        """
+        Load the nodes, the fleet, the distance matrix and the candidate lists from the snapshot of the input files
+        if the 'use_instance_snapshot' parameter is set and it exists
+
+        Output:
+            - True if the instance was loaded
+        """
+        if not self.parameters.use_instance_snapshot:
+            return False
+        instance_snapshot = InstanceSnapshot(self.parameters.output_file_path + 'snapshots/')
+        snapshot = instance_snapshot.load(self.get_snapshot_key(instance_snapshot))
+        if snapshot is None:
+            return False
+        print("Loading instance from snapshot...")
+        self.nodes_df = snapshot['nodes_df']
+        self.node_store = model.NodeStore(self.parameters, self, self.nodes_df)
+        self.fleet_df = snapshot['fleet_df']
+        self.distance_matrix = self.wrap_distance_matrix(snapshot['distance_matrix'], len(self.nodes_df), self.parameters.distance_matrix_storage)
+        self.candidate_lists = snapshot['candidates']
+        return True
+
+
+    def save_snapshot(self):
+        """
+        Store the instance in a snapshot with the candidate lists used by the heuristics and the local search
+        """
+        if not self.parameters.use_instance_snapshot:
+            return
+        self.get_node_candidates(percentage=self.parameters.candidates_percentage)
+        self.get_node_candidates(k=self.parameters.neighbors_size + 1)
+        instance_snapshot = InstanceSnapshot(self.parameters.output_file_path + 'snapshots/')
+        distance_matrix = self.distance_matrix.data if isinstance(self.distance_matrix, DistanceMatrix) else self.distance_matrix
+        instance_snapshot.save(self.get_snapshot_key(instance_snapshot), self.nodes_df, self.fleet_df, distance_matrix, self.candidate_lists)
+
+
+    def create_sub_instance(self, node_ids, fleet_df):
+        """
+        Creates the instance of a subproblem with the depot, the given customers and the given vehicles.
+        Nodes are renumbered 0..n (depot 0) and vehicles 1..m, so every heuristic works on it unchanged.
+
+        Output:
+            - (sub instance, array new node id -> node id, array new vehicle id -> vehicle id)
+        """
+        node_ids = np.concatenate(([0], np.asarray(node_ids, dtype=np.int64)))
+        vehicle_ids = fleet_df['Id'].to_numpy()
+
+        sub_instance = copy.copy(self)
+        sub_instance.nodes_df = self.nodes_df.iloc[node_ids].reset_index(drop=True)
+        sub_instance.nodes_df['Id'] = np.arange(len(node_ids))
+        sub_instance.fleet_df = fleet_df.reset_index(drop=True)
+        sub_instance.fleet_df['Id'] = np.arange(1, len(vehicle_ids) + 1)
+        sub_instance.node_store = model.NodeStore(self.parameters, sub_instance, sub_instance.nodes_df)
+        sub_instance.distance_matrix = np.asarray(self.distance_matrix[np.ix_(node_ids, node_ids)], dtype=np.float64)
+        sub_instance.candidate_lists = dict()
+        sub_instance.shared_arrays = None
+        sub_instance.route_cache = RouteCache(self.parameters.route_cache_size)
+        return sub_instance, node_ids, np.concatenate(([0], vehicle_ids))
+
+
+    def share_memory(self):
+        """
+        Publish the distance matrix and the node columns in shared memory, so the worker processes that receive
+        this instance map them instead of unpickling a copy
+        """
+        self.shared_arrays = SharedArrays()
+        if isinstance(self.distance_matrix, DistanceMatrix):
+            self.distance_matrix.data = self.shared_arrays.share('distance_matrix', self.distance_matrix.data)
+        else:
+            self.distance_matrix = self.shared_arrays.share('distance_matrix', self.distance_matrix)
+        for column in self.node_store.shared_columns:
+            setattr(self.node_store, column, self.shared_arrays.share(column, getattr(self.node_store, column)))
+
+
+    def release_shared_memory(self):
+        """
+        Go back to private copies of the shared arrays and free the shared memory blocks
+        """
+        if self.shared_arrays is None:
+            return
+        if isinstance(self.distance_matrix, DistanceMatrix):
+            self.distance_matrix.data = np.array(self.distance_matrix.data)
+        else:
+            self.distance_matrix = np.array(self.distance_matrix)
+        for column in self.node_store.shared_columns:
+            setattr(self.node_store, column, np.array(getattr(self.node_store, column)))
+        self.shared_arrays.release(unlink=True)
+        self.shared_arrays = None
+
+
+    def __getstate__(self):
+        """
+        Pickle the instance without the arrays that are in shared memory, only their descriptors
+        """
+        state = self.__dict__.copy()
+        if self.shared_arrays is not None:
+            state['shared_arrays'] = self.shared_arrays.descriptors
+            if isinstance(self.distance_matrix, DistanceMatrix):
+                state['distance_matrix'] = DistanceMatrix(self.distance_matrix.size, self.distance_matrix.storage, data=np.zeros(0, dtype=np.uint16))
+            else:
+                state['distance_matrix'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        """
+        Rebuild a pickled instance mapping the arrays that are in shared memory
+        """
+        descriptors = state['shared_arrays']
+        self.__dict__.update(state)
+        if descriptors is None:
+            return
+        self.shared_arrays = SharedArrays()
+        arrays = self.shared_arrays.attach(descriptors)
+        if isinstance(self.distance_matrix, DistanceMatrix):
+            self.distance_matrix.data = arrays['distance_matrix']
+        else:
+            self.distance_matrix = arrays['distance_matrix']
+        for column in self.node_store.shared_columns:
+            setattr(self.node_store, column, arrays[column])
@@ -15,6 +15,40 @@ class Parameters:
         self.city_name_zip_code_list = eval(parameters_dict['city_name_zip_code_list'])
         self.TAM_POPULATION = int(parameters_dict['TAM_POPULATION'])
         self.use_all_fleet = parameters_dict['use_all_fleet']
+        self.distance_mode = str(parameters_dict['distance_mode'])
+        self.use_distance_cache = str(parameters_dict['use_distance_cache']) == 'True'
+        self.distance_matrix_storage = str(parameters_dict['distance_matrix_storage'])
+        self.candidates_method = str(parameters_dict['candidates_method'])
+        self.candidates_percentage = float(parameters_dict['candidates_percentage'])
+        self.neighbors_size = int(parameters_dict['neighbors_size'])
+        self.two_opt_mode = str(parameters_dict['two_opt_mode'])
+        self.inter_route_time_limit = float(parameters_dict['inter_route_time_limit'])
+        self.population_workers = int(parameters_dict['population_workers'])
+        self.random_seed = int(parameters_dict['random_seed'])
+        self.route_workers = int(parameters_dict['route_workers'])
+        self.time_budget_seconds = float(parameters_dict['time_budget_seconds'])
+        self.construction_time_share = float(parameters_dict['construction_time_share'])
+        self.intra_route_time_share = float(parameters_dict['intra_route_time_share'])
+        self.inter_route_time_share = float(parameters_dict['inter_route_time_share'])
+        self.route_cache_size = int(parameters_dict['route_cache_size'])
+        self.exact_route_max_nodes = int(parameters_dict['exact_route_max_nodes'])
+        self.or_tools_first_solution_strategy = str(parameters_dict['or_tools_first_solution_strategy'])
+        self.or_tools_metaheuristic = str(parameters_dict['or_tools_metaheuristic'])
+        self.or_tools_time_limit = float(parameters_dict['or_tools_time_limit'])
+        self.or_tools_portfolio = str(parameters_dict['or_tools_portfolio']) == 'True'
+        self.or_tools_matrix_max_nodes = int(parameters_dict['or_tools_matrix_max_nodes'])
+        self.savings_neighbors = int(parameters_dict['savings_neighbors'])
+        self.use_clarke_wright = str(parameters_dict['use_clarke_wright']) == 'True'
+        self.sweep_start_angles = int(parameters_dict['sweep_start_angles'])
+        self.use_sweep = str(parameters_dict['use_sweep']) == 'True'
+        self.kmeans_minibatch_threshold = int(parameters_dict['kmeans_minibatch_threshold'])
+        self.hierarchical_mode = str(parameters_dict['hierarchical_mode'])
+        self.decomposition_mode = str(parameters_dict['decomposition_mode'])
+        self.decomposition_sectors = int(parameters_dict['decomposition_sectors'])
+        self.decomposition_population_size = int(parameters_dict['decomposition_population_size'])
+        self.decomposition_repair_time = float(parameters_dict['decomposition_repair_time'])
+        self.max_nodes = int(parameters_dict['max_nodes'])
+        self.use_instance_snapshot = str(parameters_dict['use_instance_snapshot']) == 'True'
 
     def __str__(self) -> str:
         class_str = 'Instance input_file_path: ' + str(self.input_file_path) + '\n'
@@ -26,4 +60,38 @@ class Parameters:
         class_str += 'Instance city_name_zip_code_list: ' + str(self.city_name_zip_code_list) + '\n'
         class_str += 'Instance TAM_POPULATION: ' + str(self.TAM_POPULATION) + '\n'
         class_str += 'Instance Flota Fija: ' + str(self.use_all_fleet) + '\n'
+        class_str += 'Instance distance_mode: ' + str(self.distance_mode) + '\n'
+        class_str += 'Instance use_distance_cache: ' + str(self.use_distance_cache) + '\n'
+        class_str += 'Instance distance_matrix_storage: ' + str(self.distance_matrix_storage) + '\n'
+        class_str += 'Instance candidates_method: ' + str(self.candidates_method) + '\n'
+        class_str += 'Instance candidates_percentage: ' + str(self.candidates_percentage) + '\n'
+        class_str += 'Instance neighbors_size: ' + str(self.neighbors_size) + '\n'
+        class_str += 'Instance two_opt_mode: ' + str(self.two_opt_mode) + '\n'
+        class_str += 'Instance inter_route_time_limit: ' + str(self.inter_route_time_limit) + '\n'
+        class_str += 'Instance population_workers: ' + str(self.population_workers) + '\n'
+        class_str += 'Instance random_seed: ' + str(self.random_seed) + '\n'
+        class_str += 'Instance route_workers: ' + str(self.route_workers) + '\n'
+        class_str += 'Instance time_budget_seconds: ' + str(self.time_budget_seconds) + '\n'
+        class_str += 'Instance construction_time_share: ' + str(self.construction_time_share) + '\n'
+        class_str += 'Instance intra_route_time_share: ' + str(self.intra_route_time_share) + '\n'
+        class_str += 'Instance inter_route_time_share: ' + str(self.inter_route_time_share) + '\n'
+        class_str += 'Instance route_cache_size: ' + str(self.route_cache_size) + '\n'
+        class_str += 'Instance exact_route_max_nodes: ' + str(self.exact_route_max_nodes) + '\n'
+        class_str += 'Instance or_tools_first_solution_strategy: ' + str(self.or_tools_first_solution_strategy) + '\n'
+        class_str += 'Instance or_tools_metaheuristic: ' + str(self.or_tools_metaheuristic) + '\n'
+        class_str += 'Instance or_tools_time_limit: ' + str(self.or_tools_time_limit) + '\n'
+        class_str += 'Instance or_tools_portfolio: ' + str(self.or_tools_portfolio) + '\n'
+        class_str += 'Instance or_tools_matrix_max_nodes: ' + str(self.or_tools_matrix_max_nodes) + '\n'
+        class_str += 'Instance savings_neighbors: ' + str(self.savings_neighbors) + '\n'
+        class_str += 'Instance use_clarke_wright: ' + str(self.use_clarke_wright) + '\n'
+        class_str += 'Instance sweep_start_angles: ' + str(self.sweep_start_angles) + '\n'
+        class_str += 'Instance use_sweep: ' + str(self.use_sweep) + '\n'
+        class_str += 'Instance kmeans_minibatch_threshold: ' + str(self.kmeans_minibatch_threshold) + '\n'
+        class_str += 'Instance hierarchical_mode: ' + str(self.hierarchical_mode) + '\n'
+        class_str += 'Instance decomposition_mode: ' + str(self.decomposition_mode) + '\n'
+        class_str += 'Instance decomposition_sectors: ' + str(self.decomposition_sectors) + '\n'
+        class_str += 'Instance decomposition_population_size: ' + str(self.decomposition_population_size) + '\n'
+        class_str += 'Instance decomposition_repair_time: ' + str(self.decomposition_repair_time) + '\n'
+        class_str += 'Instance max_nodes: ' + str(self.max_nodes) + '\n'
+        class_str += 'Instance use_instance_snapshot: ' + str(self.use_instance_snapshot) + '\n'
         return class_str
@@ -1,5 +1,6 @@
 from model import Population
 from utils import IO, Graph, Folium, DataGraph
+from .Decomposition import Decomposition
 
 class Solution:
 
@@ -19,6 +20,10 @@ class Solution:
 
 
     def constructive(self):
+        if self.parameters.decomposition_mode != 'none':
+            self.best_solution = Decomposition(self.parameters, self.instance).solve()
+            self.fitness = self.best_solution.fitness
+            return
         population = Population(self.parameters, self.instance)
         population.construct()
         self.best_solution = population.best_individual
@@ -3,3 +3,4 @@ from .Instance import Instance
 from .Parameters import Parameters
 from .Map import Map
 from .Validation import Validation
+from .Decomposition import Decomposition
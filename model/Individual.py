@@ -1,13 +1,44 @@
+import os
+import time
+import functools
+import heapq
 import random
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
-from sklearn.cluster import KMeans
-from scipy.spatial.distance import squareform
+from sklearn.cluster import KMeans, MiniBatchKMeans, AgglomerativeClustering, Birch
+from sklearn.neighbors import kneighbors_graph
 from scipy.cluster.hierarchy import fcluster, linkage
 
 import model
-from utils import Geo
+from utils import Geo, Budget, DistanceMatrix
+
+# Instance of each route worker process, received once by init_route_worker
+route_worker_parameters = None
+route_worker_instance = None
+
+
+def init_route_worker(parameters, instance):
+    """
+    Initializer of the route worker processes: keep the parameters and the instance (its arrays are mapped from shared memory)
+    """
+    global route_worker_parameters, route_worker_instance
+    route_worker_parameters = parameters
+    route_worker_instance = instance
+
+
+def optimise_route(vehicle_id, tour, max_time_seconds):
+    """
+    Improve one route in a worker process and return its new tour, its fitness and whether the optimisation finished in time
+    """
+    route = model.Route(route_worker_parameters, route_worker_instance, vehicle_id)
+    route.tour = tour
+    route.fitness = route.calculate_route_distance()
+    converged = route.optimise(max_time_seconds)
+    return route.tour, route.fitness, converged
+
 
 class Individual:
 
@@ -18,23 +49,38 @@ class Individual:
         self.routes = list()
         self.is_valid = False
         self.fitness = None
+        self.budget = Budget() # Time budget of the current phase
+        self.solution_queue = None # Queue where OR-Tools streams its solutions when it runs as a portfolio member
+        self.construction_time = 0.0 # Seconds spent building the initial solution
 
 
     # Main function to solve the CVRP
-    def solve_cvrp(self, option):
+    def solve_cvrp(self, option, budget=None, construction_time=0.0):
         """
         Solve the Capacitated Vehicle Routing Problem (CVRP) using different techniques.
-        
+        The time budget is split between construction, intra-route and inter-route phases with the '*_time_share' parameters.
+        The construction phase also receives the expected construction_time (seconds) before the budget is split.
         """
+        if budget is None:
+            budget = Budget()
+        construction_share = self.parameters.construction_time_share
+        intra_route_share = self.parameters.intra_route_time_share
+        inter_route_share = self.parameters.inter_route_time_share
+
         # print("Start Creating Initial Solution...")
+        start_time = time.time()
+        self.budget = budget.split(construction_share / (construction_share + intra_route_share + inter_route_share), reserved=construction_time, own=construction_time)
         self.initialize_routes(option)
+        self.construction_time = time.time() - start_time
         # print("End Creating Initial Solution...")
 
         # print("Start Improving Each Initial Route...")
+        self.budget = budget.split(intra_route_share / (intra_route_share + inter_route_share))
         self.improve_single_route()
         # print("End Improving Each Initial Route. Current Fitness:", self.fitness)
 
         # print("Start Improving Routes...")
+        self.budget = budget
         self.improve_routes()
         # print("End Improving Routes. Current Fitness:", self.fitness)
 
@@ -55,6 +101,10 @@ class Individual:
             routes = self.initialize_routes_nearest_neighbor()
         elif option == 6: 
             routes = self.initial_routes_compact()
+        elif option == 8:
+            routes = self.initialize_routes_clarke_wright()
+        elif option == 9:
+            routes = self.initialize_routes_sweep()
         else:
             routes = self.initialize_routes_or_tools()
 
@@ -78,46 +128,72 @@ class Individual:
         if len(client_indices) < n_vehicles:
             raise ValueError("More vehicles than clients!")
 
-        # Initialize clusters and vehicle loads using vehicle IDs
-        routes = {vehicle_id: [] for vehicle_id in vehicle_ids}
-        vehicle_loads = {vehicle_id: 0 for vehicle_id in vehicle_ids}
-        vehicle_capacities = {vehicle_id: capacity for vehicle_id, capacity in zip(vehicle_ids, self.instance.fleet_df['Capacity'].tolist())}
-
-        # Convert the full distance matrix to a condensed form required by linkage
-        condensed_distance_matrix = squareform(self.instance.distance_matrix[client_indices][:, client_indices])
-
-        # Perform hierarchical clustering
-        Z = linkage(condensed_distance_matrix, 'ward')
-
-        # Determine the number of routes based on the vehicle capacities
-        routes_labels = fcluster(Z, n_vehicles, criterion='maxclust')
-
-        # Map cluster labels to vehicle IDs
-        label_to_vehicle_id = {label: vehicle_id for label, vehicle_id in zip(np.unique(routes_labels), vehicle_ids)}
-
-        # Assign clients to routes based on labels
-        for client_idx, label in zip(client_indices, routes_labels):
-            client_demand = self.instance.nodes_df.at[client_idx, 'Items']
-            vehicle_id = label_to_vehicle_id[label]
-
-            if vehicle_loads[vehicle_id] + client_demand <= vehicle_capacities[vehicle_id]:
-                routes[vehicle_id].append(client_idx)
-                vehicle_loads[vehicle_id] += client_demand
-            else:
-                # If the vehicle is full, try to assign the client to another vehicle
-                for other_vehicle_id in vehicle_ids:
-                    if vehicle_loads[other_vehicle_id] + client_demand <= vehicle_capacities[other_vehicle_id]:
-                        routes[other_vehicle_id].append(client_idx)
-                        vehicle_loads[other_vehicle_id] += client_demand
-                        break
-                else:
+        # Cluster the clients with the mode of the 'hierarchical_mode' parameter
+        routes_labels = self.get_hierarchical_clusters(client_indices, n_vehicles)
+
+        # Map cluster labels to vehicles
+        client_vehicles = np.unique(routes_labels, return_inverse=True)[1].astype(np.int64)
+
+        # Capacity bookkeeping with arrays indexed by vehicle position
+        client_ids = self.instance.nodes_df.loc[client_indices, 'Id'].to_numpy()
+        client_demands = self.instance.nodes_df.loc[client_indices, 'Items'].to_numpy()
+        vehicle_capacities = self.instance.fleet_df['Capacity'].to_numpy()
+
+        # Load of every vehicle after each of its clients: cumulative demand of the clients sorted by vehicle, minus the
+        # cumulative demand before the first client of the vehicle. Until the first client that does not fit in its
+        # vehicle, every client keeps its vehicle and these loads are exact
+        order = np.argsort(client_vehicles, kind='stable')
+        cumulative_demands = np.concatenate(([0], np.cumsum(client_demands[order])))
+        vehicle_starts = np.searchsorted(client_vehicles[order], client_vehicles[order], side='left')
+        fits = np.empty(len(client_indices), dtype=bool)
+        fits[order] = cumulative_demands[1:] - cumulative_demands[vehicle_starts] <= vehicle_capacities[client_vehicles[order]]
+        first_overflow = int(np.argmin(fits)) if not fits.all() else len(client_indices)
+        vehicle_loads = np.bincount(client_vehicles[:first_overflow], weights=client_demands[:first_overflow], minlength=n_vehicles)
+
+        # From the first overflow on, clients are assigned one by one
+        for client_position in range(first_overflow, len(client_indices)):
+            client_demand = client_demands[client_position]
+            vehicle_index = client_vehicles[client_position]
+            if vehicle_loads[vehicle_index] + client_demand > vehicle_capacities[vehicle_index]:
+                # If the vehicle is full, assign the client to the first vehicle with enough capacity
+                other_vehicles = np.flatnonzero(vehicle_loads + client_demand <= vehicle_capacities)
+                if len(other_vehicles) == 0:
                     # If no vehicle has enough capacity, raise an error
-                    raise ValueError(f"No vehicle with enough capacity for client {client_idx}")
+                    raise ValueError(f"No vehicle with enough capacity for client {client_indices[client_position]}")
+                vehicle_index = other_vehicles[0]
+            vehicle_loads[vehicle_index] += client_demand
+            client_vehicles[client_position] = vehicle_index
 
-        # Convert route indices to client IDs
-        for vehicle_id in routes:
-            routes[vehicle_id] = [self.instance.nodes_df.at[idx, 'Id'] for idx in routes[vehicle_id]]
+        routes = {vehicle_id: client_ids[client_vehicles == vehicle_index].tolist() for vehicle_index, vehicle_id in enumerate(vehicle_ids)}
         return routes
+
+
+    def get_hierarchical_clusters(self, client_indices, n_clusters):
+        """
+        Cluster labels of the clients for the hierarchical clustering constructor. Modes ('hierarchical_mode' parameter):
+        matrix -- Ward linkage over the condensed distance matrix of the clients. O(N^2) memory
+        knn -- Ward agglomerative clustering of the projected coordinates restricted to a k nearest neighbours graph (sparse)
+        birch -- BIRCH tree of the projected coordinates with a final agglomerative step over its subclusters
+        """
+        mode = self.parameters.hierarchical_mode
+        if mode == 'matrix':
+            # Condensed form of the clients distances required by linkage
+            condensed_distance_matrix = self.instance.get_condensed_distance_matrix(client_indices)
+
+            # Perform hierarchical clustering
+            Z = linkage(condensed_distance_matrix, 'ward')
+
+            # Determine the number of routes based on the vehicle capacities
+            return fcluster(Z, n_clusters, criterion='maxclust')
+
+        clients_df = self.instance.nodes_df.loc[client_indices]
+        coordinates = self.Geo.project_coordinates(clients_df['Latitude'].values, clients_df['Longitude'].values)
+        if mode == 'knn':
+            connectivity = kneighbors_graph(coordinates, n_neighbors=min(self.parameters.neighbors_size, len(coordinates) - 1), include_self=False)
+            return AgglomerativeClustering(n_clusters=n_clusters, linkage='ward', connectivity=connectivity).fit_predict(coordinates)
+        elif mode == 'birch':
+            return Birch(n_clusters=n_clusters, threshold=5.0).fit_predict(coordinates) # Subclusters of up to 5 km radius
+        raise ValueError(f"Unknown hierarchical clustering mode: {mode}")
     
 
     def initialize_routes_compact_kmeans(self):
@@ -128,36 +204,133 @@ class Individual:
         # Remove the depot node from the list of nodes to be clustered
         client_nodes = self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']
 
-        # Extract the location coordinates of the clients
-        coordinates = client_nodes[['Latitude', 'Longitude']].values
+        # Extract the location coordinates of the clients, projected to kilometers
+        coordinates = self.Geo.project_coordinates(client_nodes['Latitude'].values, client_nodes['Longitude'].values)
 
-        # Perform K-Means clustering to create compact clusters
+        # Perform K-Means clustering to create compact clusters. MiniBatchKMeans for big instances
         random_seed = np.random.randint(0, 10000)
-        kmeans = KMeans(n_clusters=len(self.instance.fleet_df), random_state=random_seed).fit(coordinates)
-        labels = kmeans.labels_
+        clusters_size = len(self.instance.fleet_df)
+        if len(client_nodes) > self.parameters.kmeans_minibatch_threshold:
+            kmeans = MiniBatchKMeans(n_clusters=clusters_size, random_state=random_seed, batch_size=4096).fit(coordinates)
+        else:
+            kmeans = KMeans(n_clusters=clusters_size, random_state=random_seed).fit(coordinates)
 
-        # Initialize routes for each vehicle
-        routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
-        vehicle_loads = {vehicle.Id: 0 for vehicle in self.instance.fleet_df.itertuples()}
-        vehicle_capacities = {vehicle.Id: vehicle.Capacity for vehicle in self.instance.fleet_df.itertuples()}
+        # Capacitated assignment of every client to a cluster (vehicle) using the distances to all the centroids
+        labels = self.assign_clusters_regret(kmeans.transform(coordinates), client_nodes['Items'].values, self.instance.fleet_df['Capacity'].values)
 
-        # Assign nodes to the nearest vehicle based on the clusters, respecting vehicle capacities
-        for label, node in zip(labels, client_nodes.itertuples()):
-            vehicle_id = self.instance.fleet_df.iloc[label]['Id']
-            if vehicle_loads[vehicle_id] + node.Items <= vehicle_capacities[vehicle_id]:
-                routes[vehicle_id].append(node.Id)
-                vehicle_loads[vehicle_id] += node.Items
-            else:
-                # Find the closest vehicle that can take this node without exceeding capacity
-                distances_to_vehicles = kmeans.transform([[node.Latitude, node.Longitude]])
-                for idx in np.argsort(distances_to_vehicles[0]):
-                    alt_vehicle_id = self.instance.fleet_df.iloc[idx]['Id']
-                    if vehicle_loads[alt_vehicle_id] + node.Items <= vehicle_capacities[alt_vehicle_id]:
-                        routes[alt_vehicle_id].append(node.Id)
-                        vehicle_loads[alt_vehicle_id] += node.Items
-                        break
+        routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
+        vehicle_ids = self.instance.fleet_df['Id'].values
+        for node_id, label in zip(client_nodes['Id'].values, labels):
+            if label >= 0:
+                routes[vehicle_ids[label]].append(node_id)
+
+        # Clients that the repair could not place join the routes with assign_unvisited_nodes
+        unassigned_nodes = client_nodes['Id'].values[labels < 0]
+        if len(unassigned_nodes) > 0:
+            self.assign_unvisited_nodes(routes, set(unassigned_nodes.tolist()))
         return routes
-    
+
+
+    def assign_clusters_regret(self, costs, demands, capacities):
+        """
+        Capacitated assignment of N items with demands to M clusters with capacities minimizing the (N, M) costs.
+        Regret greedy in rounds: every unassigned item takes its cheapest cluster with enough free capacity, and the
+        items whose regret (second cheapest minus cheapest cost) is largest are assigned first. Items that do not fit
+        in their cluster anymore wait for the next round, where costs are masked with the remaining capacities.
+        An item that fits in no cluster because the free capacity is fragmented is placed by repair_cluster_assignment,
+        which moves items between clusters with an ejection chain.
+
+        Output:
+            - Array with the cluster of each item, -1 for the items that could not be assigned
+        """
+        costs = np.asarray(costs, dtype=np.float64)
+        demands = np.asarray(demands)
+        remaining = np.asarray(capacities, dtype=np.float64).copy()
+        labels = np.full(len(demands), -1, dtype=np.int64)
+        unassigned = np.arange(len(demands))
+        while len(unassigned) > 0:
+            if self.budget.expired():
+                # Out of time: the items left take their cheapest feasible cluster in a single pass
+                for item in unassigned[np.argsort(-demands[unassigned], kind='stable')]:
+                    feasible_costs = np.where(demands[item] <= remaining, costs[item], np.inf)
+                    cluster = int(np.argmin(feasible_costs))
+                    if np.isinf(feasible_costs[cluster]):
+                        self.repair_cluster_assignment(item, labels, costs, demands, remaining)
+                        continue
+                    labels[item] = cluster
+                    remaining[cluster] -= demands[item]
+                break
+            feasible_costs = np.where(demands[unassigned, None] <= remaining[None, :], costs[unassigned], np.inf)
+            order = np.argsort(feasible_costs, axis=1)
+            best = order[:, 0]
+            best_costs = feasible_costs[np.arange(len(unassigned)), best]
+            if np.isinf(best_costs).any():
+                # These items leave the rounds: repaired now or left unassigned
+                for item in unassigned[np.isinf(best_costs)][np.argsort(-demands[unassigned[np.isinf(best_costs)]], kind='stable')]:
+                    self.repair_cluster_assignment(item, labels, costs, demands, remaining)
+                fits = ~np.isinf(best_costs)
+                unassigned, feasible_costs, order, best, best_costs = unassigned[fits], feasible_costs[fits], order[fits], best[fits], best_costs[fits]
+                if len(unassigned) == 0:
+                    break
+            second_costs = feasible_costs[np.arange(len(unassigned)), order[:, 1]] if costs.shape[1] > 1 else best_costs
+            regrets = np.where(np.isinf(second_costs), np.inf, second_costs - best_costs)
+
+            waiting = list()
+            for index in np.lexsort((-demands[unassigned], -regrets)): # Largest regret first, then largest demand
+                item, cluster = unassigned[index], best[index]
+                if demands[item] <= remaining[cluster]:
+                    labels[item] = cluster
+                    remaining[cluster] -= demands[item]
+                else:
+                    waiting.append(item)
+            unassigned = np.array(waiting, dtype=np.int64)
+        return labels
+
+
+    def repair_cluster_assignment(self, item, labels, costs, demands, remaining, depth=2, excluded=-1):
+        """
+        Place an item that fits in no cluster with an ejection chain: items of a cluster, cheapest clusters for the item
+        first, are ejected until the item fits in it, and every ejected item is placed in turn in another cluster, with
+        up to 'depth' levels of ejections. The ejection sets tried in each cluster are its smallest items and each of
+        its three smallest items that free enough room alone. Labels and remaining are updated in place only when the whole
+        chain succeeds.
+
+        Output:
+            - True if the item was assigned, False if no chain makes room for it
+        """
+        feasible_costs = np.where(demands[item] <= remaining, costs[item], np.inf)
+        if excluded >= 0:
+            feasible_costs[excluded] = np.inf
+        cluster = int(np.argmin(feasible_costs))
+        if not np.isinf(feasible_costs[cluster]):
+            labels[item] = cluster
+            remaining[cluster] -= demands[item]
+            return True
+        if depth == 0:
+            return False
+
+        for cluster in np.argsort(costs[item], kind='stable'):
+            if cluster == excluded:
+                continue
+            members = np.flatnonzero(labels == cluster)
+            needed = demands[item] - remaining[cluster]
+            if demands[members].sum() < needed:
+                continue
+            smallest = members[np.argsort(demands[members], kind='stable')]
+            ejection_sets = [smallest[:int(np.searchsorted(np.cumsum(demands[smallest]), needed)) + 1]]
+            ejection_sets += [np.array([member]) for member in smallest[demands[smallest] >= needed][:3] if len(ejection_sets[0]) > 1 or member != ejection_sets[0][0]]
+
+            for ejected in ejection_sets:
+                new_labels, new_remaining = labels.copy(), remaining.copy()
+                new_labels[ejected] = -1
+                new_labels[item] = cluster
+                new_remaining[cluster] += demands[ejected].sum() - demands[item]
+                if all(self.repair_cluster_assignment(ejected_item, new_labels, costs, demands, new_remaining, depth - 1, cluster) for ejected_item in ejected[::-1]):
+                    labels[:] = new_labels
+                    remaining[:] = new_remaining
+                    return True
+        return False
+
 
     def initialize_routes_heuristic_min_fleet_test(self):
         """
@@ -167,7 +340,7 @@ class Individual:
         """
         # Initialize configurations
         max_nodes = 45
-        candidates_percentage = 5
+        candidates_percentage = self.parameters.candidates_percentage
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         routes_candidates = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         routes_centroids = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
@@ -175,14 +348,8 @@ class Individual:
         vehicle_capacities = {vehicle.Id: vehicle.Capacity for vehicle in self.instance.fleet_df.itertuples()}
         unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
 
-        # Calculate node candidates based on candidates_percentage
-        node_candidates = {}
-        for node in self.instance.nodes_df.itertuples():
-            if node.Node_Type != 'Depot':
-                distances = self.instance.distance_matrix[node.Index]
-                sorted_nodes = np.argsort(distances)
-                num_candidates = int(len(sorted_nodes) * (candidates_percentage / 100))
-                node_candidates[node.Id] = sorted_nodes[:num_candidates].tolist()
+        # Node candidates based on candidates_percentage, shared by every individual
+        node_candidates = self.instance.get_node_candidates(percentage=candidates_percentage).tolist()
 
         # Initialize Vehicles with a random set of nodes
         previous_node = random.choice(list(unvisited_nodes))
@@ -241,7 +408,7 @@ class Individual:
         """
         # Initialize configurations
         max_nodes = 45
-        candidates_percentage = 5
+        candidates_percentage = self.parameters.candidates_percentage
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         routes_candidates = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         routes_centroids = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
@@ -249,18 +416,12 @@ class Individual:
         vehicle_capacities = {vehicle.Id: vehicle.Capacity for vehicle in self.instance.fleet_df.itertuples()}
         unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
 
-        # Calculate node candidates based on candidates_percentage
-        node_candidates = {}
-        for node in self.instance.nodes_df.itertuples():
-            if node.Node_Type != 'Depot':
-                distances = self.instance.distance_matrix[node.Index]
-                sorted_nodes = np.argsort(distances)
-                num_candidates = int(len(sorted_nodes) * (candidates_percentage / 100))
-                node_candidates[node.Id] = sorted_nodes[:num_candidates].tolist()
+        # Node candidates based on candidates_percentage, shared by every individual
+        node_candidates = self.instance.get_node_candidates(percentage=candidates_percentage).tolist()
 
         # Initialize Vehicles with a random set of nodes
         for vehicle in self.instance.fleet_df.itertuples():
-            if not unvisited_nodes:
+            if not unvisited_nodes or self.budget.expired():
                 break
             current_node = random.choice(list(unvisited_nodes))
             # print("Creando ruta para el vehiculo: ", vehicle.Id)
@@ -273,7 +434,7 @@ class Individual:
 
                 # Add Candidates
                 stop = False
-                while not stop:                   
+                while not stop and not self.budget.expired():
                     min_distance = 1_000_000
                     best_candidate = None
                     best_candidate_items = None
@@ -298,6 +459,9 @@ class Individual:
                         stop=True
 
         #print(node_candidates)
+        if unvisited_nodes and self.budget.expired():
+            # The construction budget is over: the nodes left go to the closest routes
+            self.assign_unvisited_nodes(routes, unvisited_nodes)
         return routes             
 
     def initialize_routes_heuristic(self):
@@ -308,7 +472,7 @@ class Individual:
         """
         # Initialize configurations
         max_nodes = 45
-        candidates_percentage = 5
+        candidates_percentage = self.parameters.candidates_percentage
         init_candidates = 3
         nodes_to_assing = 10
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
@@ -316,14 +480,8 @@ class Individual:
         vehicle_capacities = {vehicle.Id: vehicle.Capacity for vehicle in self.instance.fleet_df.itertuples()}
         unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
 
-        # Calculate node candidates based on candidates_percentage
-        node_candidates = {}
-        for node in self.instance.nodes_df.itertuples():
-            if node.Node_Type != 'Depot':
-                distances = self.instance.distance_matrix[node.Index]
-                sorted_nodes = np.argsort(distances)
-                num_candidates = int(len(sorted_nodes) * (candidates_percentage / 100))
-                node_candidates[node.Id] = sorted_nodes[:num_candidates].tolist()
+        # Node candidates based on candidates_percentage, shared by every individual
+        node_candidates = self.instance.get_node_candidates(percentage=candidates_percentage).tolist()
 
         # Initialize Vehicles with a random set of nodes
         for vehicle in self.instance.fleet_df.itertuples():
@@ -363,6 +521,8 @@ class Individual:
         # Solve problem by assigning nodes to vehicles
         #while unvisited_nodes:
         for i in range(nodes_to_assing):
+            if self.budget.expired():
+                break # The nodes left are assigned to the closest routes below
             for vehicle, candidates in routes_candidates.items():
                 route_nodes = routes[vehicle]
                 # print('Ruta: ', vehicle, ' Nodos:', route_nodes,' Candidatos:', candidates)
@@ -425,12 +585,10 @@ class Individual:
     def get_closest_routes_centroids(self, node_coords, routes_centroid):
         """
         """
-        distances_to_route = []
-        distances_to_route_vehicles = []
-        for vehicle, centroid in routes_centroid.items():
-            distance = self.Geo.calculate_distance(node_coords, centroid)
-            distances_to_route.append(distance)
-            distances_to_route_vehicles.append(vehicle)
+        # Same rounded geodesic distances as calculate_distance, computed for every centroid at once
+        distances_to_route_vehicles = list(routes_centroid)
+        centroids = np.array([routes_centroid[vehicle] for vehicle in distances_to_route_vehicles], dtype=np.float64)
+        distances_to_route = self.Geo.calculate_distance_matrix(np.array([node_coords], dtype=np.float64), centroids, mode='vincenty')[0].tolist()
 
         # Combine the distances and vehicle IDs into a list of tuples and sort them by distance (ascending order)
         sorted_distances_with_vehicles = sorted(zip(distances_to_route, distances_to_route_vehicles), key=lambda x: x[0])
@@ -441,6 +599,87 @@ class Individual:
         return closest_routes_list
 
 
+    def assign_unvisited_nodes(self, routes, unvisited_nodes):
+        """
+        Quick completion of a construction stopped by the time budget: every unvisited node is appended to the route,
+        with enough capacity left, that has the closest node to it (the depot for the empty routes). A node that fits
+        in no route gets room with make_room_for_node.
+        """
+        node_store = self.instance.node_store
+        vehicle_ids = list(routes)
+        capacities = self.instance.fleet_df.set_index('Id').loc[vehicle_ids, 'Capacity'].to_numpy()
+        loads = np.array([node_store.items[node_store.get_position(np.asarray(routes[vehicle_id], dtype=np.int64))].sum() for vehicle_id in vehicle_ids])
+        unassigned_nodes = set()
+        for node in sorted(unvisited_nodes):
+            demand = node_store.items[node_store.get_position(node)]
+            distances = np.asarray(self.instance.distance_matrix[node])
+            closest = np.array([distances[routes[vehicle_id]].min() if routes[vehicle_id] else distances[0] for vehicle_id in vehicle_ids])
+            fits = loads + demand <= capacities
+            if not fits.any():
+                if not self.make_room_for_node(routes, vehicle_ids, loads, capacities, node, closest):
+                    unassigned_nodes.add(node)
+                continue
+            closest[~fits] = np.inf
+            best = int(np.argmin(closest))
+            routes[vehicle_ids[best]].append(node)
+            loads[best] += demand
+        unvisited_nodes.clear()
+
+        # Check if all nodes have been assigned
+        if unassigned_nodes:
+            print(f"Warning: Not all nodes were assigned to a route. Unassigned nodes: {unassigned_nodes}")
+        return routes
+
+
+    def make_room_for_node(self, routes, vehicle_ids, loads, capacities, node, closest):
+        """
+        Insert a node that fits in no route by ejecting the smallest nodes of a route, closest routes first, until the
+        node fits in it. The ejected nodes are moved to the other routes with room for them, biggest first and each one
+        to the route with the closest node. The routes and the loads are updated in place only when every ejected node is placed.
+
+        Output:
+            - True if the node was inserted
+        """
+        node_store = self.instance.node_store
+        demand = node_store.items[node_store.get_position(node)]
+        for target in np.argsort(closest, kind='stable'):
+            target_nodes = np.asarray(routes[vehicle_ids[target]], dtype=np.int64)
+            if demand > capacities[target] or len(target_nodes) == 0:
+                continue
+            target_demands = node_store.items[node_store.get_position(target_nodes)]
+            smallest = np.argsort(target_demands, kind='stable')
+            freed = np.cumsum(target_demands[smallest])
+            ejected_size = int(np.searchsorted(freed, loads[target] + demand - capacities[target])) + 1
+            if ejected_size > len(target_nodes):
+                continue
+
+            # Place the ejected nodes in the other routes on a copy of the loads
+            new_loads = loads.copy()
+            new_loads[target] += demand - freed[ejected_size - 1]
+            moves = list()
+            for ejected in smallest[:ejected_size][::-1]:
+                ejected_node, ejected_demand = int(target_nodes[ejected]), target_demands[ejected]
+                distances = np.asarray(self.instance.distance_matrix[ejected_node])
+                ejected_closest = np.array([distances[routes[vehicle_id]].min() if routes[vehicle_id] else distances[0] for vehicle_id in vehicle_ids])
+                ejected_closest[new_loads + ejected_demand > capacities] = np.inf
+                ejected_closest[target] = np.inf
+                best = int(np.argmin(ejected_closest))
+                if np.isinf(ejected_closest[best]):
+                    break
+                new_loads[best] += ejected_demand
+                moves.append((ejected_node, best))
+            if len(moves) < ejected_size:
+                continue
+
+            ejected_nodes = {ejected_node for ejected_node, _ in moves}
+            routes[vehicle_ids[target]] = [route_node for route_node in routes[vehicle_ids[target]] if route_node not in ejected_nodes] + [node]
+            for ejected_node, best in moves:
+                routes[vehicle_ids[best]].append(ejected_node)
+            loads[:] = new_loads
+            return True
+        return False
+
+
     def initialize_routes_heuristic2(self):
         """
         Generate an initial feasible solution for the CVRP using a heuristic that
@@ -454,14 +693,8 @@ class Individual:
         vehicle_loads = {vehicle.Id: 0 for vehicle in self.instance.fleet_df.itertuples()}
         unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
 
-        # Calculate node candidates based on candidates_percentage
-        node_candidates = {}
-        for node in self.instance.nodes_df.itertuples():
-            if node.Node_Type != 'Depot':
-                distances = self.instance.distance_matrix[node.Index]
-                sorted_nodes = np.argsort(distances)
-                num_candidates = int(len(sorted_nodes) * (candidates_percentage / 100))
-                node_candidates[node.Id] = sorted_nodes[:num_candidates].tolist()
+        # Node candidates based on candidates_percentage, shared by every individual
+        node_candidates = self.instance.get_node_candidates(percentage=candidates_percentage).tolist()
 
         # Solve problem by assigning nodes to vehicles
         while unvisited_nodes:
@@ -503,50 +736,227 @@ class Individual:
         # Initialize clusters and vehicle loads and capacities using vehicle IDs
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         vehicle_loads = {vehicle.Id: 0 for vehicle in self.instance.fleet_df.itertuples()}
-        vehicle_capacities = {vehicle.Id: vehicle.Capacity for vehicle in self.instance.fleet_df.itertuples()}
         depot_id = self.instance.nodes_df[self.instance.nodes_df['Name'] == 'Depot']['Id'].values[0]
-        unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
+        search = model.NearestNeighborSearch(self.parameters, self.instance, self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot']['Id'])
         
         # Iterate over each vehicle to create a route
         for vehicle in self.instance.fleet_df.itertuples():
-            if not unvisited_nodes:
+            if not search.has_unvisited():
                 break  # Break the loop if there are no nodes left to visit
 
             # Start with the nearest node from the depot
             current_node = depot_id
-            while unvisited_nodes and vehicle_loads[vehicle.Id] < vehicle.Capacity:
-                nearest_next, min_dist = None, float('inf')
-                for next_node in unvisited_nodes:
-                    dist = self.instance.distance_matrix[current_node, next_node]
-                    if dist < min_dist:
-                        min_dist, nearest_next = dist, next_node
+            while search.has_unvisited() and vehicle_loads[vehicle.Id] < vehicle.Capacity:
+                nearest_next, min_dist = search.nearest(current_node)
                 
                 if nearest_next is None:
                     break  # Break the loop if no nearest node was found
 
-                next_node_items = self.instance.nodes_df.at[nearest_next, 'Items']
+                next_node_items = search.get_demand(nearest_next)
                 if vehicle_loads[vehicle.Id] + next_node_items <= vehicle.Capacity:
                     routes[vehicle.Id].append(nearest_next)
                     vehicle_loads[vehicle.Id] += next_node_items
-                    unvisited_nodes.remove(nearest_next)
+                    search.visit(nearest_next)
                     current_node = nearest_next
                 else:
                     break  # Break the loop if the node cannot be added due to capacity constraints
 
         # Check if all nodes have been assigned
+        unvisited_nodes = search.get_unvisited_nodes()
         if unvisited_nodes:
             print(f"Warning: Not all nodes were assigned to a route. Unassigned nodes: {unvisited_nodes}")
             # Optionally, handle the unassigned nodes here
         return routes
     
 
+    def initialize_routes_clarke_wright(self):
+        """
+        Generate an initial feasible solution for the CVRP with the parallel Clarke-Wright savings algorithm.
+        The savings d(depot, i) + d(depot, j) - d(i, j) are computed at once with numpy, for every pair of customers or,
+        when the 'savings_neighbors' parameter is greater than 0, only for each customer and its nearest customers.
+        Pairs are merged from a heap while the merged load fits in the largest vehicle, and the routes are then assigned
+        to the vehicles with a best fit decreasing rule. If there are more routes than vehicles, the cheapest merges that
+        still fit are applied until they are not, and the customers of the routes without a vehicle are assigned with
+        assign_unvisited_nodes.
+        """
+        depot_id = 0
+        node_store = self.instance.node_store
+        customers = node_store.ids[node_store.ids != depot_id]
+        demands = dict(zip(node_store.ids.tolist(), node_store.items.tolist()))
+        distance_matrix = self.instance.distance_matrix
+
+        # Savings of the candidate pairs
+        neighbors_size = self.parameters.savings_neighbors
+        if neighbors_size > 0:
+            candidates = self.instance.get_node_candidates(k=neighbors_size + 1)[customers]
+            first = np.repeat(customers, candidates.shape[1])
+            second = candidates.ravel()
+            valid = (second != depot_id) & (first < second)
+            first, second = first[valid], second[valid]
+        else:
+            rows, columns = np.triu_indices(len(customers), 1)
+            first, second = customers[rows], customers[columns]
+        savings = np.asarray(distance_matrix[depot_id, first]) + np.asarray(distance_matrix[depot_id, second]) - np.asarray(distance_matrix[first, second])
+        positive = savings > 0
+        savings_heap = list(zip((-savings[positive]).tolist(), first[positive].tolist(), second[positive].tolist()))
+        heapq.heapify(savings_heap)
+
+        # Merge routes
+        max_capacity = self.instance.fleet_df['Capacity'].max()
+        route_of = {customer: customer for customer in customers.tolist()}
+        merged_routes = {customer: deque([customer]) for customer in customers.tolist()}
+        route_loads = {customer: demands[customer] for customer in customers.tolist()}
+        n_vehicles = len(self.instance.fleet_df)
+        pops = 0
+        while savings_heap:
+            pops += 1
+            # Once there are no more routes than vehicles the merges can stop when the construction budget is over
+            if pops % 1024 == 0 and len(merged_routes) <= n_vehicles and self.budget.expired():
+                break
+            _, node_i, node_j = heapq.heappop(savings_heap)
+            route_i, route_j = route_of[node_i], route_of[node_j]
+            if route_i == route_j or route_loads[route_i] + route_loads[route_j] > max_capacity:
+                continue
+            # node_i has to be the last node of its route and node_j the first one of its route
+            nodes_i, nodes_j = merged_routes[route_i], merged_routes[route_j]
+            if nodes_i[-1] != node_i:
+                if nodes_i[0] != node_i:
+                    continue
+                nodes_i.reverse()
+            if nodes_j[0] != node_j:
+                if nodes_j[-1] != node_j:
+                    continue
+                nodes_j.reverse()
+            nodes_i.extend(nodes_j)
+            for node in nodes_j:
+                route_of[node] = route_i
+            route_loads[route_i] += route_loads.pop(route_j)
+            del merged_routes[route_j]
+        if len(merged_routes) > n_vehicles:
+            self.merge_excess_routes(merged_routes, route_loads, n_vehicles, max_capacity)
+
+        # Assign the routes to the vehicles: biggest routes first, each one to the smallest free vehicle where it fits
+        routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
+        free_vehicles = sorted(((vehicle.Capacity, vehicle.Id) for vehicle in self.instance.fleet_df.itertuples()))
+        unassigned_nodes = set()
+        for route_key in sorted(merged_routes, key=lambda key: route_loads[key], reverse=True):
+            vehicle_index = next((index for index, (capacity, _) in enumerate(free_vehicles) if capacity >= route_loads[route_key]), None)
+            if vehicle_index is None:
+                unassigned_nodes.update(merged_routes[route_key])
+                continue
+            _, vehicle_id = free_vehicles.pop(vehicle_index)
+            routes[vehicle_id] = list(merged_routes[route_key])
+
+        # The customers of the routes without a vehicle join the closest routes with room for them
+        if unassigned_nodes:
+            self.assign_unvisited_nodes(routes, unassigned_nodes)
+        return routes
+
+
+    def merge_excess_routes(self, merged_routes, route_loads, n_vehicles, max_capacity):
+        """
+        Merge the pair of routes with the largest saving (the smallest cost increase) among the pairs whose merged load
+        fits in the largest vehicle, until there are no more routes than vehicles or no pair fits. The four ways of
+        joining the ends of two routes are evaluated at once with numpy.
+        """
+        depot_id = 0
+        distance_matrix = self.instance.distance_matrix
+        while len(merged_routes) > n_vehicles:
+            keys = list(merged_routes)
+            firsts = np.array([merged_routes[key][0] for key in keys], dtype=np.int64)
+            lasts = np.array([merged_routes[key][-1] for key in keys], dtype=np.int64)
+            loads = np.array([route_loads[key] for key in keys], dtype=np.float64)
+            fits = loads[:, None] + loads[None, :] <= max_capacity
+            np.fill_diagonal(fits, False)
+
+            # Joins: last of i to first of j, first of i to first of j, last of i to last of j, first of i to last of j
+            best_savings, best_join = np.full(fits.shape, -np.inf), np.zeros(fits.shape, dtype=np.int64)
+            for join, (ends_i, ends_j) in enumerate(((lasts, firsts), (firsts, firsts), (lasts, lasts), (firsts, lasts))):
+                savings = np.asarray(distance_matrix[depot_id, ends_i])[:, None] + np.asarray(distance_matrix[depot_id, ends_j])[None, :] - np.asarray(distance_matrix[np.ix_(ends_i, ends_j)])
+                savings = np.where(fits, savings, -np.inf)
+                better = savings > best_savings
+                best_savings[better], best_join[better] = savings[better], join
+            index_i, index_j = np.unravel_index(int(np.argmax(best_savings)), best_savings.shape)
+            if np.isinf(best_savings[index_i, index_j]):
+                break
+
+            route_i, route_j = keys[index_i], keys[index_j]
+            nodes_i, nodes_j = merged_routes[route_i], merged_routes[route_j]
+            join = best_join[index_i, index_j]
+            if join in (1, 3):
+                nodes_i.reverse()
+            if join in (2, 3):
+                nodes_j.reverse()
+            nodes_i.extend(nodes_j)
+            route_loads[route_i] += route_loads.pop(route_j)
+            del merged_routes[route_j]
+
+
+    def initialize_routes_sweep(self):
+        """
+        Generate an initial feasible solution for the CVRP with the sweep heuristic. The customers are sorted by their
+        bearing from the depot and the angular order is cut into routes that fill the vehicles, biggest first.
+        'sweep_start_angles' start angles, evenly spaced after a random offset, are evaluated and the cheapest one that
+        serves the most customers is kept. The angular order is walked twice in a row, so every start angle reuses the same cumulative demands and distances
+        and the cuts of all the start angles are computed together, one vehicle at a time.
+        """
+        depot_id = 0
+        node_store = self.instance.node_store
+        depot_position = node_store.get_position(depot_id)
+        customers = node_store.ids[node_store.ids != depot_id]
+        positions = node_store.get_position(customers)
+        coordinates = np.column_stack((node_store.latitude, node_store.longitude))
+        bearings = self.Geo.calculate_bearings(coordinates[depot_position], coordinates[positions])
+        angular_order = np.argsort(bearings, kind='stable')
+        sorted_bearings = bearings[angular_order]
+        sorted_customers = customers[angular_order]
+        size = len(sorted_customers)
+
+        # Cumulative demand and distance along two laps of the angular order: a route [a, b) loads
+        # cumulative_demands[b] - cumulative_demands[a] and travels cumulative_distances[b - 1] - cumulative_distances[a]
+        laps = np.tile(sorted_customers, 2)
+        cumulative_demands = np.concatenate(([0], np.cumsum(np.tile(node_store.items[positions][angular_order], 2))))
+        cumulative_distances = np.concatenate(([0], np.cumsum(np.asarray(self.instance.distance_matrix[laps[:-1], laps[1:]]))))
+        from_depot = np.asarray(self.instance.distance_matrix[depot_id, sorted_customers])
+        to_depot = np.asarray(self.instance.distance_matrix[sorted_customers, depot_id])
+
+        vehicles = sorted(((vehicle.Capacity, vehicle.Id) for vehicle in self.instance.fleet_df.itertuples()), reverse=True)
+        start_angles_size = max(1, self.parameters.sweep_start_angles)
+        start_angles = random.uniform(0, 2 * np.pi / start_angles_size) + np.arange(start_angles_size) * 2 * np.pi / start_angles_size
+        starts = np.unique(np.searchsorted(sorted_bearings, start_angles) % size)
+        ends = starts + size
+
+        # Cut points: each route takes the longest prefix of the remaining customers that fits in its vehicle
+        cuts = [starts]
+        for capacity, _ in vehicles:
+            if np.all(cuts[-1] == ends):
+                break
+            cuts.append(np.minimum(np.searchsorted(cumulative_demands, cumulative_demands[cuts[-1]] + capacity, side='right') - 1, ends))
+        cuts = np.array(cuts)
+        route_starts, route_ends = cuts[:-1], cuts[1:]
+        # From some start angles the fleet can not serve every customer: the cheapest start angle among the ones that
+        # leave the fewest customers out is kept, and those customers join the routes with assign_unvisited_nodes
+        left_out = ends - cuts[-1]
+        used = route_ends > route_starts
+        last = np.maximum(route_ends - 1, route_starts)
+        costs = np.where(used, from_depot[route_starts % size] + cumulative_distances[last] - cumulative_distances[route_starts] + to_depot[last % size], 0).sum(axis=0)
+        best = int(np.lexsort((costs, left_out))[0])
+
+        routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
+        for (_, vehicle_id), route_start, route_end in zip(vehicles, route_starts[:, best], route_ends[:, best]):
+            routes[vehicle_id] = laps[route_start:route_end].tolist()
+        if left_out[best] > 0:
+            self.assign_unvisited_nodes(routes, set(laps[cuts[-1][best]:ends[best]].tolist()))
+        return routes
+
+
     def initial_routes_compact(self):
         """
         Create initial routes with the objective of making them as compact as possible.
         """
         # Set of all nodes that have not been visited, excluding the depot
         depot_id = self.instance.nodes_df.iloc[0]['Id']
-        unvisited_nodes = set(self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot'].index)
+        search = model.NearestNeighborSearch(self.parameters, self.instance, self.instance.nodes_df[self.instance.nodes_df['Node_Type'] != 'Depot'].index)
         
         # Initialize routes
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
@@ -557,22 +967,23 @@ class Individual:
         
         # Assign nodes to vehicles
         for vehicle in self.instance.fleet_df.itertuples():
-            while unvisited_nodes and vehicle_loads[vehicle.Id] < vehicle.Capacity:
+            while search.has_unvisited() and vehicle_loads[vehicle.Id] < vehicle.Capacity:
                 if not routes[vehicle.Id]:  # If route is empty, start from depot
-                    nearest_next, dist = self.find_nearest_neighbor(depot_id, unvisited_nodes)
+                    nearest_next, dist = search.nearest(depot_id)
                 else:  # Otherwise, continue from last node in route
                     last_node = routes[vehicle.Id][-1]
-                    nearest_next, dist = self.find_nearest_neighbor(last_node, unvisited_nodes)
+                    nearest_next, dist = search.nearest(last_node)
                     
                 # Check if the nearest node can be added without exceeding the capacity and distance threshold
-                if nearest_next and vehicle_loads[vehicle.Id] + self.instance.nodes_df.at[nearest_next, 'Items'] <= vehicle.Capacity and dist <= max_distance_threshold:
+                if nearest_next and vehicle_loads[vehicle.Id] + search.get_demand(nearest_next) <= vehicle.Capacity and dist <= max_distance_threshold:
                     routes[vehicle.Id].append(nearest_next)
-                    vehicle_loads[vehicle.Id] += self.instance.nodes_df.at[nearest_next, 'Items']
-                    unvisited_nodes.remove(nearest_next)
+                    vehicle_loads[vehicle.Id] += search.get_demand(nearest_next)
+                    search.visit(nearest_next)
                 else:
                     break  # If no suitable node is found, move to the next vehicle
 
         # Check if all nodes have been assigned
+        unvisited_nodes = search.get_unvisited_nodes()
         if unvisited_nodes:
             print(f"Warning: Not all nodes were assigned to a route. Unassigned nodes: {unvisited_nodes}")
             # Handle unassigned nodes as needed
@@ -583,22 +994,24 @@ class Individual:
         """
         Find the nearest neighbor to a given node from a set of unvisited clients.
         """
-        nearest_next = None
-        min_dist = float('inf')
-        for client in unvisited_clients:
-            dist = self.instance.distance_matrix[last_node][client]
-            if dist < min_dist:
-                min_dist = dist
-                nearest_next = client
-        return nearest_next, min_dist
+        if not unvisited_clients:
+            return None, float('inf')
+        clients = np.fromiter(unvisited_clients, dtype=np.int64, count=len(unvisited_clients))
+        distances = np.asarray(self.instance.distance_matrix[last_node, clients])
+        nearest = int(np.argmin(distances))
+        return int(clients[nearest]), distances[nearest]
     
 
     def initialize_routes_or_tools(self):
         """Solve the CVRP problem Using OR-Tools"""
+        if self.budget.expired():
+            print("Warning: No time left to build the OR-Tools model, using the Nearest Neighbor Heuristic instead")
+            return self.initialize_routes_nearest_neighbor()
+
         # Instantiate the data problem.
         data = {}
-        data["distance_matrix"] = self.instance.distance_matrix
-        data["demands"] = self.instance.nodes_df['Items'].tolist()  # Agregar los pesos de los nodos
+        data["num_nodes"] = len(self.instance.distance_matrix)
+        data["demands"] = self.instance.nodes_df['Items'].astype(np.int64).tolist()  # Agregar los pesos de los nodos
         data["vehicle_capacities"] = self.instance.fleet_df['Capacity'].tolist()  # Capacidades de los vehículos
         data["num_vehicles"] = len(self.instance.fleet_df)
         data["depot"] = 0
@@ -608,32 +1021,24 @@ class Individual:
         ends = [data["depot"]] * data["num_vehicles"]
 
         # Create the routing index manager.
-        manager = pywrapcp.RoutingIndexManager(len(data["distance_matrix"]), data["num_vehicles"], starts, ends)
+        manager = pywrapcp.RoutingIndexManager(data["num_nodes"], data["num_vehicles"], starts, ends)
 
         # Create Routing Model.
         routing = pywrapcp.RoutingModel(manager)
 
-        # Create and register a transit callback.
-        def distance_callback(from_index, to_index):
-            """Returns the distance between the two nodes."""
-            # Convert from routing variable Index to distance matrix NodeIndex.
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return data["distance_matrix"][from_node][to_node]
-
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Register the distances. A dense matrix up to 'or_tools_matrix_max_nodes' nodes is copied into OR-Tools and
+        # evaluated natively, without calling Python for every arc. The compact storages and bigger matrices are read
+        # row by row from a Python callback instead, so they are never copied as a whole
+        if isinstance(self.instance.distance_matrix, DistanceMatrix) or data["num_nodes"] > self.parameters.or_tools_matrix_max_nodes:
+            transit_callback_index = routing.RegisterTransitCallback(self.get_or_tools_distance_callback(manager))
+        else:
+            transit_callback_index = routing.RegisterTransitMatrix(np.ceil(self.instance.distance_matrix).astype(np.int64).tolist())
 
         # Define cost of each arc.
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
         # Add Capacity constraint.
-        def demand_callback(from_index):
-            """Returns the demand of the node."""
-            # Convert from routing variable Index to demands NodeIndex.
-            from_node = manager.IndexToNode(from_index)
-            return data["demands"][from_node]
-
-        demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+        demand_callback_index = routing.RegisterUnaryTransitVector(data["demands"])
         routing.AddDimensionWithVehicleCapacity(
             demand_callback_index,
             0,  # null capacity slack
@@ -644,15 +1049,53 @@ class Individual:
 
         # Setting first solution heuristic.
         search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC)
-        search_parameters.local_search_metaheuristic = (routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC)
-        search_parameters.time_limit.seconds = 45
+        search_parameters.first_solution_strategy = self.get_or_tools_option(routing_enums_pb2.FirstSolutionStrategy.Value, self.parameters.or_tools_first_solution_strategy)
+        search_parameters.local_search_metaheuristic = self.get_or_tools_option(routing_enums_pb2.LocalSearchMetaheuristic.Value, self.parameters.or_tools_metaheuristic)
+        search_parameters.time_limit.FromMilliseconds(max(1, int(self.budget.limit(self.parameters.or_tools_time_limit) * 1000)))
         # search_parameters.time_limit.FromSeconds(1)
 
+        # Stream the improving solutions found during the search
+        if self.solution_queue is not None:
+            streamed = {'cost': np.inf, 'time': 0.0}
+            def solution_callback():
+                cost = routing.CostVar().Value()
+                if cost < streamed['cost'] and time.time() - streamed['time'] >= 1:
+                    routes = self.get_or_tools_routes(routing, manager, data, lambda index: routing.NextVar(index).Value())
+                    self.solution_queue.put(('incumbent', routes, cost))
+                    streamed['cost'], streamed['time'] = cost, time.time()
+            routing.AddAtSolutionCallback(solution_callback)
+
         # Solve the problem.
         solution = routing.SolveWithParameters(search_parameters)
+        if solution is None:
+            print("Warning: OR-Tools found no solution within the time limit, using the Nearest Neighbor Heuristic instead")
+            return self.initialize_routes_nearest_neighbor()
 
         # Extract solution and save it into routes
+        return self.get_or_tools_routes(routing, manager, data, lambda index: solution.Value(routing.NextVar(index)))
+
+
+    def get_or_tools_distance_callback(self, manager, max_rows=1024):
+        """
+        Transit callback with the integer distance between two routing indices. The rows of the distance matrix are
+        converted to lists of integers when OR-Tools first asks for them and the last max_rows used rows are kept,
+        so the compact storages are never copied into a whole N * N matrix.
+        """
+        distance_matrix = self.instance.distance_matrix
+
+        @functools.lru_cache(maxsize=max_rows)
+        def get_row(from_node):
+            return np.ceil(np.asarray(distance_matrix[from_node])).astype(np.int64).tolist()
+
+        def distance_callback(from_index, to_index):
+            return get_row(manager.IndexToNode(from_index))[manager.IndexToNode(to_index)]
+        return distance_callback
+
+
+    def get_or_tools_routes(self, routing, manager, data, next_index):
+        """
+        Routes of an OR-Tools assignment, next_index gives the value of the NextVar of a routing index
+        """
         routes = {vehicle.Id: [] for vehicle in self.instance.fleet_df.itertuples()}
         for vehicle_id in range(data["num_vehicles"]):
             index = routing.Start(vehicle_id)
@@ -661,27 +1104,32 @@ class Individual:
                 node_index = manager.IndexToNode(index)
                 if node_index != data["depot"]:
                     routes[vehicle_id + 1].append(node_index)
-                index = solution.Value(routing.NextVar(index))
+                index = next_index(index)
 
         return routes
         
 
+    def get_or_tools_option(self, enum, name):
+        """
+        Value of an OR-Tools search option given by its name, e.g. 'PATH_CHEAPEST_ARC' or 'GUIDED_LOCAL_SEARCH'
+        """
+        if name not in enum.keys():
+            raise ValueError(f"Unknown OR-Tools option: {name}. Options: {list(enum.keys())}")
+        return enum.Value(name)
+
+
     def create_routes_object(self, routes):
         """
         """
         # Add the depot at the start and end of each route
-        depot_node = model.Node(self.parameters, self.instance, 0)
+        depot_id = 0
         initial_routes = list()   
         for vehicle_index in routes:
             if routes[vehicle_index]:                
                 route = model.Route(self.parameters, self.instance, vehicle_index) # Create Route
-                route.nodes.append(depot_node) # Add depot start                
-                for node_id in routes[vehicle_index]: # Add nodes in route
-                    current_node = model.Node(self.parameters, self.instance, node_id)
-                    route.nodes.append(current_node)
-                route.nodes.append(depot_node) # Add depot end
+                route.tour = np.array([depot_id] + list(routes[vehicle_index]) + [depot_id], dtype=np.int32) # Depot start, nodes in route, depot end
 
-                route.fitness = route.calculate_route_distance(route.nodes)
+                route.fitness = route.calculate_route_distance()
                 route.load = route.calculate_route_load()
                 initial_routes.append(route)
 
@@ -694,29 +1142,117 @@ class Individual:
         Apply routes improvements to each route created in initial solution
         """
         # print("Executing 2-opt, 3-opt...")
-        solution_fitness = 0
+        # Routes whose customers were already optimised take the cached tour. Only the routes whose optimisation finished
+        # in time are cached, so a route cut short by the budget can be improved by a later individual
+        route_cache = self.instance.route_cache
+        routes = list()
         for route in self.routes:
-            # print('Mejorando Ruta:', route.id, '... FITNESS:', route.fitness)
+            cached_route = route_cache.get(route.tour)
+            if cached_route is None:
+                routes.append(route)
+            else:
+                route.tour, route.fitness = cached_route
 
-            route.two_opt() # Apply 2-opt to each route
-            # print('\tFitness tras 2-opt:', route.id, '... FITNESS:', route.fitness)
+        workers = self.get_route_workers(routes)
+        if workers > 1:
+            routes = self.improve_single_route_parallel(routes, workers)
+        else:
+            converged_routes = list()
+            for index, route in enumerate(routes):
+                if self.budget.expired():
+                    # Routes not started keep the tour of the initial solution
+                    break
+                # print('Mejorando Ruta:', route.id, '... FITNESS:', route.fitness)
+                max_time_seconds = min(60, self.budget.remaining() / (len(routes) - index)) # Share the remaining time between the routes left
+                if route.optimise(max_time_seconds): # Apply 2-opt, 3-opt and lin_kernighan to each route
+                    converged_routes.append(route)
+                # print('\tFitness tras optimise:', route.id, '... FITNESS:', route.fitness)
+            routes = converged_routes
+        for route in routes:
+            route_cache.put(route.tour, route.fitness)
+        self.fitness = sum(route.fitness for route in self.routes)
+
+
+    def get_route_workers(self, routes):
+        """
+        Number of processes used to improve the routes. 0 in the 'route_workers' parameter uses the cores left
+        by the population workers and the OR-Tools portfolio member, so a parallel population does not oversubscribe the machine
+        """
+        cpu_count = max(1, (os.cpu_count() or 1) - int(self.parameters.or_tools_portfolio))
+        population_workers = self.parameters.population_workers
+        if population_workers <= 0:
+            population_workers = cpu_count
+        free_cores = max(1, cpu_count // min(population_workers, self.parameters.TAM_POPULATION))
+        workers = self.parameters.route_workers
+        if workers <= 0 or workers > free_cores:
+            workers = free_cores
+        return min(workers, len(routes))
+
+
+    def improve_single_route_parallel(self, routes, workers):
+        """
+        Improve the given routes in a process pool. Longest routes are sent first and every worker returns the new
+        tour and fitness of its route. Routes that have not started when the budget expires keep their tour.
 
-            route.three_opt_first_improvement() # Apply 3-opt first improvent to each route
-            # print('\tFitness tras 3-opt first improvement:', route.id, '... FITNESS:', route.fitness)
+        Output:
+            - List of the routes whose optimisation finished in time
+        """
+        owns_shared_memory = self.instance.shared_arrays is None
+        if owns_shared_memory:
+            self.instance.share_memory()
+        try:
+            routes = sorted(routes, key=lambda route: len(route.tour), reverse=True)
+            max_time_seconds = min(60, self.budget.remaining() * workers / len(routes))
+            converged_routes = list()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_route_worker, initargs=(self.parameters, self.instance)) as executor:
+                futures = [executor.submit(optimise_route, route.id, route.tour, max_time_seconds) for route in routes]
+                for position, (route, future) in enumerate(zip(routes, futures)):
+                    if self.budget.expired():
+                        for pending_future in futures[position:]:
+                            pending_future.cancel()
+                    if future.cancelled():
+                        continue
+                    route.tour, route.fitness, converged = future.result()
+                    if converged:
+                        converged_routes.append(route)
+            return converged_routes
+        finally:
+            if owns_shared_memory:
+                self.instance.release_shared_memory()
+
+
+    def improve_routes(self, max_time_seconds=None):
+        """
+        Apply inter-route improvements (relocate, Or-opt, swap, 2-opt*, cross-exchange) between the routes of the individual
+        """
+        if max_time_seconds is None:
+            max_time_seconds = self.budget.limit(self.parameters.inter_route_time_limit)
+        if len(self.routes) > 1:
+            local_search = model.LocalSearch(self.parameters, self.instance, self.routes)
+            changed_routes = local_search.run(max_time_seconds)
+            for route_index in changed_routes:
+                if self.budget.expired():
+                    break
+                self.routes[route_index].two_opt(budget=self.budget) # Reoptimize the order of the routes that changed
 
-            route.three_opt() # Apply 3-opt to each route
-            # print('\tFitness tras 3-opt:', route.id, '... FITNESS:', route.fitness)
+        # Drop the routes that were left empty
+        self.routes = [route for route in self.routes if len(route.tour) > 2]
+        self.fitness = sum(route.fitness for route in self.routes)
 
-            route.lin_kernighan(max_iter=10000, max_time_seconds=60) # Apply lin_kernighan to each route
-            # print('\tFitness tras lin_kernighan:', route.id, '... FITNESS:', route.fitness)
+    def get_compact_routes(self):
+        """
+        Routes as (vehicle id, tour array) tuples, cheap to send between processes
+        """
+        return [(route.id, route.tour) for route in self.routes]
 
-            solution_fitness = solution_fitness + route.fitness
-            # print('----------------------------------------------------------------')
-        self.fitness = solution_fitness
 
+    def set_compact_routes(self, compact_routes):
+        """
+        Rebuild the routes and fitness from the output of get_compact_routes
+        """
+        self.create_routes_object({vehicle_id: tour[1:-1].tolist() for vehicle_id, tour in compact_routes})
+        self.fitness = sum(route.fitness for route in self.routes)
 
-    def improve_routes(self):
-        i = 0
 
     def print_solution(self):
         for route in self.routes:
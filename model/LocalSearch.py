@@ -0,0 +1,222 @@
+import time
+import numpy as np
+
+
+class LocalSearch:
+    """
+    Capacity aware inter-route local search. Customers are moved between the routes of an individual with
+    relocate, Or-opt, swap, 2-opt* and cross-exchange moves. Every move is evaluated by its distance delta and
+    an O(1) load check (prefix loads of each route), and only the nearest nodes of each customer
+    (Instance candidate lists) are tried as insertion points.
+    """
+    def __init__(self, parameters, instance, routes, max_segment_length=3):
+        self.parameters = parameters
+        self.instance = instance
+        self.routes = routes
+        self.max_segment_length = max_segment_length
+        self.distance_matrix = instance.distance_matrix
+        self.neighbors = instance.get_node_candidates(k=parameters.neighbors_size + 1).tolist()
+
+        node_store = instance.node_store
+        self.demands = dict(zip(node_store.ids.tolist(), node_store.items.tolist()))
+        self.tours = [route.tour.tolist() for route in routes]
+        self.capacities = [route.vehicle.capacity for route in routes]
+        self.route_of = dict()
+        self.position_of = dict()
+        self.prefix_loads = [None] * len(self.tours)
+        for route_index in range(len(self.tours)):
+            self.update_route(route_index)
+
+
+    def update_route(self, route_index):
+        """
+        Refresh positions and prefix loads of a route after a move
+        """
+        tour = self.tours[route_index]
+        prefix_load = 0
+        prefix_loads = list()
+        for position, node in enumerate(tour):
+            prefix_load += self.demands[node]
+            prefix_loads.append(prefix_load)
+            if 0 < position < len(tour) - 1:
+                self.route_of[node] = route_index
+                self.position_of[node] = position
+        self.prefix_loads[route_index] = prefix_loads
+
+
+    def segment_load(self, route_index, start, end):
+        """
+        Load of the positions start..end (both included) of a route
+        """
+        prefix_loads = self.prefix_loads[route_index]
+        return prefix_loads[end] - prefix_loads[start - 1]
+
+
+    def distance(self, node1, node2):
+        return self.distance_matrix[node1, node2]
+
+
+    def run(self, max_time_seconds):
+        """
+        Applies the best improving move of each customer until no customer improves or the time is over.
+
+        Output:
+            - Set of the indices of the routes that changed
+        """
+        start_time = time.time()
+        changed_routes = set()
+        improved = True
+        while improved and (time.time() - start_time) < max_time_seconds:
+            improved = False
+            for node in list(self.route_of):
+                if (time.time() - start_time) > max_time_seconds:
+                    break
+                move = self.find_best_move(node)
+                if move is not None:
+                    changed_routes.update(self.apply_move(move))
+                    improved = True
+
+        # Write the new tours into the Route objects
+        for route_index in changed_routes:
+            route = self.routes[route_index]
+            route.tour = np.array(self.tours[route_index], dtype=np.int32)
+            route.fitness = route.calculate_route_distance()
+            route.load = route.calculate_route_load()
+        return changed_routes
+
+
+    def find_best_move(self, u):
+        """
+        Evaluates every move between customer u and its neighbours placed in other routes.
+        Returns the best improving move as (delta, move_type, arguments) or None.
+        """
+        best_move = None
+        route_u = self.route_of[u]
+        for v in self.neighbors[u]:
+            if v == u or v not in self.route_of:
+                continue
+            route_v = self.route_of[v]
+            if route_v == route_u:
+                continue
+            for move in (self.evaluate_relocate(u, v), self.evaluate_two_opt_star(u, v), self.evaluate_cross_exchange(u, v)):
+                if move is not None and (best_move is None or move[0] < best_move[0]):
+                    best_move = move
+        return best_move
+
+
+    def evaluate_relocate(self, u, v):
+        """
+        Relocate (1 node) and Or-opt (2 or 3 nodes): moves the segment that starts at u next to v, in both orientations
+        """
+        route_u, route_v = self.route_of[u], self.route_of[v]
+        tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+        position_u, position_v = self.position_of[u], self.position_of[v]
+        load_v = self.prefix_loads[route_v][-1]
+        best_move = None
+        for segment_length in range(1, self.max_segment_length + 1):
+            end = position_u + segment_length - 1
+            if end > len(tour_u) - 2:
+                break
+            segment_load = self.segment_load(route_u, position_u, end)
+            if load_v + segment_load > self.capacities[route_v]:
+                break
+            first, last = tour_u[position_u], tour_u[end]
+            previous_node, next_node = tour_u[position_u - 1], tour_u[end + 1]
+            removal_delta = self.distance(previous_node, next_node) - self.distance(previous_node, first) - self.distance(last, next_node)
+            # Insert between (v, next of v) or (previous of v, v)
+            for insert_after in (position_v, position_v - 1):
+                x, y = tour_v[insert_after], tour_v[insert_after + 1]
+                base = removal_delta - self.distance(x, y)
+                for reverse in (False, True):
+                    head, tail = (last, first) if reverse else (first, last)
+                    delta = base + self.distance(x, head) + self.distance(tail, y)
+                    if delta < -1e-9 and (best_move is None or delta < best_move[0]):
+                        best_move = (delta, 'relocate', (route_u, position_u, end, route_v, insert_after, reverse))
+        return best_move
+
+
+    def evaluate_two_opt_star(self, u, v):
+        """
+        2-opt*: joins the start of the route of u (up to u) with the end of the route of v (from v) and the start
+        of the route of v (up to the previous of v) with the end of the route of u (after u). Adds the edge (u, v).
+        """
+        route_u, route_v = self.route_of[u], self.route_of[v]
+        tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+        position_u, position_v = self.position_of[u], self.position_of[v]
+        prefix_u, prefix_v = self.prefix_loads[route_u], self.prefix_loads[route_v]
+        new_load_u = prefix_u[position_u] + (prefix_v[-1] - prefix_v[position_v - 1])
+        new_load_v = prefix_v[position_v - 1] + (prefix_u[-1] - prefix_u[position_u])
+        if new_load_u > self.capacities[route_u] or new_load_v > self.capacities[route_v]:
+            return None
+        u_next, v_previous = tour_u[position_u + 1], tour_v[position_v - 1]
+        delta = (self.distance(u, v) + self.distance(v_previous, u_next)
+                 - self.distance(u, u_next) - self.distance(v_previous, v))
+        if delta < -1e-9:
+            return (delta, 'two_opt_star', (route_u, position_u, route_v, position_v))
+        return None
+
+
+    def evaluate_cross_exchange(self, u, v):
+        """
+        Swap (1 node each) and cross-exchange (segments of up to max_segment_length nodes): exchanges the segment
+        that starts at u with the segment that starts at v
+        """
+        route_u, route_v = self.route_of[u], self.route_of[v]
+        tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+        position_u, position_v = self.position_of[u], self.position_of[v]
+        load_u, load_v = self.prefix_loads[route_u][-1], self.prefix_loads[route_v][-1]
+        u_previous, v_previous = tour_u[position_u - 1], tour_v[position_v - 1]
+        best_move = None
+        for length_u in range(1, self.max_segment_length + 1):
+            end_u = position_u + length_u - 1
+            if end_u > len(tour_u) - 2:
+                break
+            segment_load_u = self.segment_load(route_u, position_u, end_u)
+            u_last, u_after = tour_u[end_u], tour_u[end_u + 1]
+            for length_v in range(1, self.max_segment_length + 1):
+                end_v = position_v + length_v - 1
+                if end_v > len(tour_v) - 2:
+                    break
+                segment_load_v = self.segment_load(route_v, position_v, end_v)
+                if load_u - segment_load_u + segment_load_v > self.capacities[route_u] or load_v - segment_load_v + segment_load_u > self.capacities[route_v]:
+                    continue
+                v_last, v_after = tour_v[end_v], tour_v[end_v + 1]
+                delta = (self.distance(u_previous, v) + self.distance(v_last, u_after)
+                         + self.distance(v_previous, u) + self.distance(u_last, v_after)
+                         - self.distance(u_previous, u) - self.distance(u_last, u_after)
+                         - self.distance(v_previous, v) - self.distance(v_last, v_after))
+                if delta < -1e-9 and (best_move is None or delta < best_move[0]):
+                    best_move = (delta, 'cross_exchange', (route_u, position_u, end_u, route_v, position_v, end_v))
+        return best_move
+
+
+    def apply_move(self, move):
+        """
+        Applies a move to the tours and returns the indices of the routes it changed
+        """
+        _, move_type, arguments = move
+        if move_type == 'relocate':
+            route_u, start, end, route_v, insert_after, reverse = arguments
+            tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+            segment = tour_u[start:end + 1]
+            if reverse:
+                segment = segment[::-1]
+            self.tours[route_v] = tour_v[:insert_after + 1] + segment + tour_v[insert_after + 1:]
+            self.tours[route_u] = tour_u[:start] + tour_u[end + 1:]
+            changed = (route_u, route_v)
+        elif move_type == 'two_opt_star':
+            route_u, position_u, route_v, position_v = arguments
+            tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+            self.tours[route_u] = tour_u[:position_u + 1] + tour_v[position_v:]
+            self.tours[route_v] = tour_v[:position_v] + tour_u[position_u + 1:]
+            changed = (route_u, route_v)
+        else:
+            route_u, start_u, end_u, route_v, start_v, end_v = arguments
+            tour_u, tour_v = self.tours[route_u], self.tours[route_v]
+            self.tours[route_u] = tour_u[:start_u] + tour_v[start_v:end_v + 1] + tour_u[end_u + 1:]
+            self.tours[route_v] = tour_v[:start_v] + tour_u[start_u:end_u + 1] + tour_v[end_v + 1:]
+            changed = (route_u, route_v)
+
+        for route_index in changed:
+            self.update_route(route_index)
+        return changed
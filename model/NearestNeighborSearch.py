@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class NearestNeighborSearch:
+    """
+    Nearest unvisited node queries for the constructive heuristics. Unvisited nodes are a boolean mask indexed by
+    node id, so the nearest one is found with a single argmin: first over the candidate list of the node (its
+    'neighbors_size' nearest nodes, sorted by distance) and, only if all of them were visited or the nearest ones
+    tie with the last candidate, over the masked distance matrix row.
+    """
+    def __init__(self, parameters, instance, nodes):
+        self.parameters = parameters
+        self.instance = instance
+        self.distance_matrix = instance.distance_matrix
+        self.candidates = instance.get_node_candidates(k=min(parameters.neighbors_size + 1, len(instance.nodes_df)))
+        node_store = instance.node_store
+        self.demands = np.zeros(len(self.distance_matrix), dtype=node_store.items.dtype)
+        self.demands[node_store.ids] = node_store.items
+        self.unvisited = np.zeros(len(self.distance_matrix), dtype=bool)
+        self.unvisited[np.asarray(list(nodes), dtype=np.int64)] = True
+        self.unvisited_size = int(self.unvisited.sum())
+
+
+    def has_unvisited(self):
+        return self.unvisited_size > 0
+
+
+    def get_unvisited_nodes(self):
+        return set(np.flatnonzero(self.unvisited).tolist())
+
+
+    def get_demand(self, node):
+        return self.demands[node]
+
+
+    def visit(self, node):
+        if self.unvisited[node]:
+            self.unvisited[node] = False
+            self.unvisited_size -= 1
+
+
+    def nearest(self, node):
+        """
+        Nearest unvisited node to a given node
+
+        Output:
+            - (nearest node, distance) or (None, inf) if every node was visited
+        """
+        if self.unvisited_size == 0:
+            return None, float('inf')
+        candidates = self.candidates[node]
+        unvisited_candidates = self.unvisited[candidates]
+        if unvisited_candidates.any():
+            # Candidates are sorted by distance: ties with the first unvisited one are broken by the lowest id.
+            # A tie with the last candidate may go on past the candidate list, the whole row is searched then
+            distances = np.asarray(self.distance_matrix[node, candidates[unvisited_candidates]])
+            if distances[0] < self.distance_matrix[node, candidates[-1]]:
+                nearest_node = int(candidates[unvisited_candidates][distances == distances[0]].min())
+                return nearest_node, distances[0]
+
+        distances = np.where(self.unvisited, np.asarray(self.distance_matrix[node]), np.inf)
+        nearest_node = int(np.argmin(distances)) # First, lowest id, of the nearest nodes
+        return nearest_node, distances[nearest_node]
@@ -1,6 +1,7 @@
 
 
 class Node:
+    __slots__ = ('parameters', 'instance', 'id', 'position')
 
     def __init__(self, parameters, instance, id):
         self.parameters = parameters
@@ -9,21 +10,63 @@ class Node:
         self.create_node()
 
     def create_node(self):
-        node = self.instance.nodes_df[self.instance.nodes_df['Id'] == self.id]
-        self.name = node['Name'].values[0]
-        self.address = node['Address'].values[0]
-        self.location = node['Location'].values[0]
-        self.province = node['Province'].values[0]
-        self.zip_code = node['Zip_Code'].values[0]
-        self.items = node['Items'].values[0]
-        self.weight = node['Weight'].values[0]
-        self.node_type = node['Node_Type'].values[0]
-        self.tw_start = node['TW_Start'].values[0]
-        self.tw_end = node['TW_End'].values[0]
-        self.latitude = node['Latitude'].values[0]
-        self.longitude = node['Longitude'].values[0]
-        self.email = node['Email'].values[0]
-        self.phone = node['Phone'].values[0]
+        self.position = self.instance.node_store.get_position(self.id)
+
+    @property
+    def name(self):
+        return self.instance.node_store.get_text('name', self.position)
+
+    @property
+    def address(self):
+        return self.instance.node_store.get_text('address', self.position)
+
+    @property
+    def location(self):
+        return self.instance.node_store.get_text('location', self.position)
+
+    @property
+    def province(self):
+        return self.instance.node_store.get_text('province', self.position)
+
+    @property
+    def zip_code(self):
+        return self.instance.node_store.get_text('zip_code', self.position)
+
+    @property
+    def items(self):
+        return self.instance.node_store.items[self.position]
+
+    @property
+    def weight(self):
+        return self.instance.node_store.weight[self.position]
+
+    @property
+    def node_type(self):
+        return self.instance.node_store.get_text('node_type', self.position)
+
+    @property
+    def tw_start(self):
+        return self.instance.node_store.get_text('tw_start', self.position)
+
+    @property
+    def tw_end(self):
+        return self.instance.node_store.get_text('tw_end', self.position)
+
+    @property
+    def latitude(self):
+        return self.instance.node_store.latitude[self.position]
+
+    @property
+    def longitude(self):
+        return self.instance.node_store.longitude[self.position]
+
+    @property
+    def email(self):
+        return self.instance.node_store.get_text('email', self.position)
+
+    @property
+    def phone(self):
+        return self.instance.node_store.get_text('phone', self.position)
 
     def __str__(self) -> str:
         return 'Node: ' + str(self.id) + ' Name: ' + str(self.name) + ' Items: ' + str(self.items) + ' Coords: ' + str(self.latitude) +  ', ' + str(self.longitude)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+import model
+
+class NodeStore:
+    """
+    Columnar storage of the nodes of an instance. Numeric columns are numpy arrays and text columns are
+    interned (each distinct value is stored once and referenced by an integer code), so a node is only
+    a position inside the arrays and reading any attribute is an array lookup.
+    """
+    # Numeric columns that Instance.share_memory publishes in shared memory
+    shared_columns = ('ids', 'positions', 'items', 'weight', 'latitude', 'longitude', 'tw_start_minutes', 'tw_end_minutes')
+
+    def __init__(self, parameters, instance, nodes_df):
+        self.parameters = parameters
+        self.instance = instance
+        self.size = len(nodes_df)
+        self.ids = nodes_df['Id'].to_numpy(dtype=np.int64)
+        self.positions = np.full(self.ids.max() + 1, -1, dtype=np.int64)
+        self.positions[self.ids] = np.arange(self.size)
+
+        # Numeric columns
+        self.items = nodes_df['Items'].to_numpy()
+        self.weight = nodes_df['Weight'].to_numpy()
+        self.latitude = nodes_df['Latitude'].to_numpy(dtype=np.float64)
+        self.longitude = nodes_df['Longitude'].to_numpy(dtype=np.float64)
+        self.tw_start_minutes = self.time_to_minutes(nodes_df['TW_Start'])
+        self.tw_end_minutes = self.time_to_minutes(nodes_df['TW_End'])
+
+        # Interned text columns: (codes, values)
+        self.text_columns = dict()
+        for attribute, column in [('name', 'Name'), ('address', 'Address'), ('location', 'Location'), ('province', 'Province'),
+                                  ('zip_code', 'Zip_Code'), ('node_type', 'Node_Type'), ('tw_start', 'TW_Start'),
+                                  ('tw_end', 'TW_End'), ('email', 'Email'), ('phone', 'Phone')]:
+            codes, values = pd.factorize(nodes_df[column], use_na_sentinel=False)
+            self.text_columns[attribute] = (codes.astype(np.int32), np.asarray(values, dtype=object))
+
+        # Flyweight Node objects, created the first time they are requested
+        self.nodes = [None] * self.size
+
+
+    def time_to_minutes(self, time_column):
+        """
+        Converts a column of 'HH:MM' strings into minutes from midnight
+        """
+        hours_minutes = time_column.astype(str).str.split(':', expand=True).astype(int)
+        return (hours_minutes[0] * 60 + hours_minutes[1]).to_numpy(dtype=np.int32)
+
+
+    def get_position(self, node_id):
+        """
+        Position of a node id inside the arrays
+        """
+        return self.positions[node_id]
+
+
+    def get_text(self, attribute, position):
+        """
+        Value of an interned text column for the node in a given position
+        """
+        codes, values = self.text_columns[attribute]
+        return values[codes[position]]
+
+
+    def get_node(self, node_id):
+        """
+        Returns the shared Node object of a node id
+        """
+        position = self.positions[node_id]
+        if self.nodes[position] is None:
+            self.nodes[position] = model.Node(self.parameters, self.instance, int(node_id))
+        return self.nodes[position]
+
+
+    def __getstate__(self):
+        """
+        Pickle without the flyweight nodes and, when the instance is in shared memory, without its numeric columns
+        """
+        state = self.__dict__.copy()
+        state['nodes'] = [None] * self.size
+        if self.instance.shared_arrays is not None:
+            for column in self.shared_columns:
+                state[column] = None
+        return state
+
+
+    def __len__(self):
+        return self.size
@@ -1,5 +1,61 @@
 from model import Individual
+from utils import Budget
+import os
+import queue
 import random
+import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Instance of each worker process, received once by init_worker
+worker_parameters = None
+worker_instance = None
+
+
+def init_worker(parameters, instance):
+    """
+    Initializer of the worker processes: keep the parameters and the instance (its arrays are mapped from shared memory)
+    """
+    global worker_parameters, worker_instance
+    worker_parameters = parameters
+    worker_instance = instance
+    worker_instance.route_cache.get_updates() # Only the changes made in this worker are sent back
+
+
+def construct_individual(option, seed, budget, share, reserved, construction_time, route_cache_entries):
+    """
+    Solve one individual in a worker process, with its expected construction time and a share of the remaining budget
+    once the constructions left are reserved. The route cache of the worker first takes the entries of the parent.
+
+    Output:
+        - (compact routes, fitness, construction time, route cache updates), or None if the budget is over before
+          the individual starts
+    """
+    route_cache = worker_instance.route_cache
+    route_cache.merge(route_cache_entries)
+    if budget.expired():
+        return None
+    random.seed(seed)
+    np.random.seed(seed)
+    individual = Individual(worker_parameters, worker_instance)
+    individual.solve_cvrp(option, budget.split(share, reserved, construction_time), construction_time)
+    return individual.get_compact_routes(), individual.fitness, individual.construction_time, route_cache.get_updates()
+
+
+def run_or_tools_member(parameters, instance, seed, budget, solution_queue):
+    """
+    OR-Tools portfolio member: solve an OR-Tools individual streaming the incumbent solutions found by the search,
+    and finally send the improved individual
+    """
+    instance.route_cache.get_updates() # Only the changes made in this process are sent back
+    random.seed(seed)
+    np.random.seed(seed)
+    individual = Individual(parameters, instance)
+    individual.solution_queue = solution_queue
+    individual.solve_cvrp(7, budget)
+    solution_queue.put(('final', individual.get_compact_routes(), individual.fitness, instance.route_cache.get_updates()))
+
+
 class Population:
 
     def __init__(self, parameters, instance):
@@ -9,6 +65,7 @@ class Population:
         self.individuals_fitness = list()
         self.best_individual = None
         self.best_fitness = 0
+        self.construction_times = dict() # Option -> longest construction time observed (seconds)
 
     def construct(self):
         """
@@ -21,33 +78,226 @@ class Population:
             4: 'Random Assignment Heuristic Minimize Fleet', 
             5: 'Nearest Neighborg Heuristic', 
             6: 'Routes Compact: Not stable', 
-            7: 'CVRP Or-Tools'}
+            7: 'CVRP Or-Tools',
+            8: 'Clarke-Wright Savings',
+            9: 'Sweep Heuristic'}
         print("Starting Algorithm...")
         print("Algorithm Options:", options_names)
+        options = list()
+        seeds = list()
         for iteration in range(self.parameters.TAM_POPULATION):
-            # print('Start Iteration:', iteration, '...')
-            individual = Individual(self.parameters, self.instance)
-            if self.parameters.use_all_fleet == 'True':
-                if iteration == 0:
-                    option = 1
-                else:
-                    option = random.choice([2,3])
+            seed = self.parameters.random_seed + iteration
+            random.seed(seed)
+            options.append(self.select_option(iteration))
+            seeds.append(seed)
+
+        # Global time budget: new individuals are not started once it is over
+        budget = Budget(self.parameters.time_budget_seconds)
+        iterations = list(range(self.parameters.TAM_POPULATION))
+
+        # Portfolio: OR-Tools runs in its own process while the heuristics are solved
+        or_tools_member = None
+        if self.parameters.or_tools_portfolio and 7 in options:
+            or_tools_iteration = options.index(7)
+            iterations.remove(or_tools_iteration)
+            or_tools_member = self.start_or_tools_member(seeds[or_tools_iteration], budget)
+
+        try:
+            workers = self.get_workers()
+            if workers > 1:
+                self.construct_parallel(iterations, options, seeds, workers, options_names, budget)
             else:
-                if iteration == 0:
-                    option = 7
-                elif iteration == 1:
-                    option = 5
-                else:
-                    option = 4
-            individual.solve_cvrp(option)
-            self.individuals.append(individual)
-            self.individuals_fitness.append(individual.fitness)
-            print('End Iteration:', iteration, ' Algorithm Option:', option, ' - ', options_names[option], ' FITNESS:', individual.fitness)
-
-        # Evaluation
-        best_solution_index = self.individuals_fitness.index(min(self.individuals_fitness))
-        self.best_individual = self.individuals[best_solution_index]
-        self.best_fitness = self.individuals_fitness[best_solution_index]
+                for position, iteration in enumerate(iterations):
+                    construction_time = self.get_construction_time(options[iteration])
+                    if position > 0 and budget.remaining() <= construction_time:
+                        print('Time budget reached after', position, 'individuals')
+                        break
+                    # print('Start Iteration:', iteration, '...')
+                    random.seed(seeds[iteration])
+                    np.random.seed(seeds[iteration])
+                    individual = Individual(self.parameters, self.instance)
+                    share = self.get_budget_share(position, len(iterations), workers)
+                    reserved = self.get_reserved_time([options[iteration] for iteration in iterations[position:]], workers)
+                    individual.solve_cvrp(options[iteration], budget.split(share, reserved, construction_time), construction_time)
+                    self.add_construction_time(options[iteration], individual.construction_time)
+                    self.add_individual(individual, iteration, options[iteration], options_names)
+
+            if or_tools_member is not None:
+                individual = self.finish_or_tools_member(or_tools_member, budget)
+                if individual is not None:
+                    self.add_individual(individual, or_tools_iteration, 7, options_names)
+        finally:
+            self.instance.release_shared_memory()
+        print(self.instance.route_cache)
+
+    def select_option(self, iteration):
+        """
+        Initial solution technique of each iteration
+        """
+        if self.parameters.use_all_fleet == 'True':
+            if iteration == 0:
+                return 1
+            return random.choice([2,3])
+        if iteration == 0:
+            return 7
+        elif iteration == 1:
+            return 5
+        # Optional constructors ('use_*' parameters) run after the first two
+        optional_options = [option for option, enabled in ((8, self.parameters.use_clarke_wright), (9, self.parameters.use_sweep)) if enabled]
+        if iteration - 2 < len(optional_options):
+            return optional_options[iteration - 2]
+        return 4
+
+
+    def get_workers(self):
+        """
+        Number of processes used to construct the population. 0 in the 'population_workers' parameter uses every core,
+        but the one taken by the OR-Tools portfolio member when it is enabled
+        """
+        workers = self.parameters.population_workers
+        if workers <= 0:
+            workers = max(1, (os.cpu_count() or 1) - int(self.parameters.or_tools_portfolio))
+        return min(workers, self.parameters.TAM_POPULATION)
+
+
+    def get_budget_share(self, position, total, workers):
+        """
+        Share of the remaining time budget given to the individual in a position when it starts: the individuals left
+        are solved in waves of 'workers' individuals
+        """
+        return min(1.0, workers / (total - position))
+
+
+    def get_construction_time(self, option):
+        """
+        Expected construction time of an option: the longest one observed for it or, if it has not run yet, for any option
+        """
+        if option in self.construction_times:
+            return self.construction_times[option]
+        return max(self.construction_times.values(), default=0.0)
+
+
+    def add_construction_time(self, option, construction_time):
+        self.construction_times[option] = max(construction_time, self.construction_times.get(option, 0.0))
+
+
+    def get_reserved_time(self, options_left, workers):
+        """
+        Time reserved for the constructions of the individuals left, which cannot be interrupted, solved in waves of 'workers'
+        """
+        return sum(self.get_construction_time(option) for option in options_left) / workers
+
+
+    def construct_parallel(self, iterations, options, seeds, workers, options_names, budget):
+        """
+        Solve the individuals of the given iterations in a process pool. The distance matrix and the node columns are
+        shared through shared memory and every worker returns compact route arrays, rebuilt here into Individual objects.
+        Individuals are submitted when a worker is free, so each one gets its budget with the construction times
+        observed so far, and no individual is started once less than its expected construction time is left.
+        """
+        if self.instance.shared_arrays is None:
+            self.instance.share_memory()
+        results = dict()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.parameters, self.instance)) as executor:
+            running = dict()
+            position = 0
+            while position < len(iterations) or running:
+                while position < len(iterations) and len(running) < workers:
+                    iteration = iterations[position]
+                    construction_time = self.get_construction_time(options[iteration])
+                    if position > 0 and budget.remaining() <= construction_time:
+                        print('Time budget reached after', position, 'individuals')
+                        position = len(iterations)
+                        break
+                    share = self.get_budget_share(position, len(iterations), workers)
+                    reserved = self.get_reserved_time([options[iteration] for iteration in iterations[position:]], workers)
+                    future = executor.submit(construct_individual, options[iteration], seeds[iteration], budget, share, reserved, construction_time,
+                                             self.instance.route_cache.get_entries())
+                    running[future] = iteration
+                    position += 1
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    iteration = running.pop(future)
+                    if future.result() is not None:
+                        results[iteration] = future.result()
+                        self.add_construction_time(options[iteration], results[iteration][2])
+                        self.instance.route_cache.merge(*results[iteration][3])
+
+        # Individuals are added in the order of their iterations, like the sequential construction
+        for iteration in sorted(results):
+            compact_routes, fitness, _, _ = results[iteration]
+            individual = Individual(self.parameters, self.instance)
+            individual.set_compact_routes(compact_routes)
+            self.add_individual(individual, iteration, options[iteration], options_names)
+
+
+    def start_or_tools_member(self, seed, budget):
+        """
+        Launch the OR-Tools portfolio member in a separate process. It receives the instance with its arrays in shared memory.
+
+        Output:
+            - (process, solution queue)
+        """
+        if self.instance.shared_arrays is None:
+            self.instance.share_memory()
+        solution_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_or_tools_member, args=(self.parameters, self.instance, seed, budget, solution_queue))
+        process.start()
+        return process, solution_queue
+
+
+    def finish_or_tools_member(self, or_tools_member, budget):
+        """
+        Wait for the OR-Tools portfolio member until it ends or the budget is over and build the Individual of its
+        last solution: the improved final one or, if it was stopped, the best incumbent streamed by the search
+        """
+        process, solution_queue = or_tools_member
+        last_message = None
+        while True:
+            try:
+                last_message = solution_queue.get(timeout=min(1.0, max(budget.remaining(), 0.01)))
+                if last_message[0] == 'final':
+                    break
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+            if budget.expired():
+                break
+        if last_message is not None and last_message[0] == 'final':
+            # The member has sent its solution and is exiting
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        elif process.is_alive():
+            print('Time budget reached, stopping OR-Tools with its best incumbent solution')
+            process.terminate()
+        process.join()
+
+        if last_message is None:
+            return None
+        individual = Individual(self.parameters, self.instance)
+        if last_message[0] == 'final':
+            individual.set_compact_routes(last_message[1])
+            self.instance.route_cache.merge(*last_message[3])
+        else:
+            individual.create_routes_object(last_message[1])
+            individual.fitness = sum(route.fitness for route in individual.routes)
+        return individual
+
+
+    def add_individual(self, individual, iteration, option, options_names):
+        """
+        Add a solved individual and keep the best individual found so far
+        """
+        self.individuals.append(individual)
+        self.individuals_fitness.append(individual.fitness)
+        if self.best_individual is None or individual.fitness < self.best_fitness:
+            self.best_individual = individual
+            self.best_fitness = individual.fitness
+        print('End Iteration:', iteration, ' Algorithm Option:', option, ' - ', options_names[option], ' FITNESS:', individual.fitness)
+
 
     def __str__(self) -> str:
         print('Population:', self.individuals, ' BEST SOLUTION:', self.best_individual.fitness)
\ No newline at end of file
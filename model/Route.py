@@ -1,6 +1,9 @@
+import numpy as np
 import model
 
 import time
+from collections import deque
+from utils import Budget
 
 class Route:
 
@@ -8,7 +11,7 @@ class Route:
         self.parameters = parameters
         self.instance = instance
         self.id = id
-        self.nodes = list()
+        self.tour = np.zeros(0, dtype=np.int32) # Node ids of the route, depot at start and end
         self.load = 0
         self.vehicle = None
         self.fitness = 100_000_000
@@ -21,152 +24,490 @@ class Route:
         self.vehicle = model.Vehicle(self.parameters, self.instance, self.id)
 
 
+    @property
+    def nodes(self):
+        """
+        Node objects of the route, a view built from the node ids stored in the tour array
+        """
+        return [self.instance.node_store.get_node(node_id) for node_id in self.tour]
+
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self.tour = np.array([node.id for node in nodes], dtype=np.int32)
+
+
     # Function to calculate the total load of a route
     def calculate_route_load(self):
-        total_load = 0
-        for node in self.nodes:
-            total_load += node.items
-        return total_load
+        node_store = self.instance.node_store
+        return node_store.items[node_store.get_position(self.tour)].sum()
 
 
     # Function to calculate the total distance of a route
     def calculate_route_distance(self, route=None):
         if route is None:
-            route = self.nodes
-        return sum(self.instance.distance_matrix[route[i].id, route[i+1].id] for i in range(len(route)-1))
-        
+            route = self.tour
+        elif not isinstance(route, np.ndarray):
+            route = [node.id for node in route]
+        route = np.asarray(route)
+        if len(route) < 2:
+            return 0
+        return np.sum(self.instance.distance_matrix[route[:-1], route[1:]])
+
+
+    def get_tour_distances(self):
+        """
+        Distances between the nodes of the tour indexed by their current position, as nested lists.
+        Local search works on a list of positions (order) and reads distances[order[a]][order[b]], which is much
+        faster than indexing the distance matrix element by element. The tour is rebuilt with self.tour[order].
+        """
+        return np.asarray(self.instance.distance_matrix[np.ix_(self.tour, self.tour)], dtype=np.float64).tolist()
+
+
+    def set_order(self, order):
+        """
+        Applies a reordering of the positions of the tour and updates the fitness
+        """
+        self.tour = self.tour[np.asarray(order, dtype=np.int64)]
+        self.fitness = self.calculate_route_distance()
+
 
     # Functions to apply 2-opt optimization on a single route
-    def two_opt(self):
+    def two_opt(self, mode=None, budget=None):
+        """
+        Applies 2-opt optimization on the route. The mode (by default the 'two_opt_mode' parameter) can be:
+        sequential -- Scans the moves one by one and applies every improving move as soon as it is found
+        best -- Evaluates the whole neighbourhood at once with numpy and applies the best move
+        multiple -- Evaluates the whole neighbourhood at once with numpy and applies a set of non overlapping improving moves
+        The search stops, keeping the moves already applied, when the budget expires.
+        """
+        if mode is None:
+            mode = self.parameters.two_opt_mode
+        if budget is None:
+            budget = Budget()
+        if mode == 'sequential':
+            self.two_opt_sequential(budget)
+        elif mode in ('best', 'multiple'):
+            self.two_opt_batched(apply_multiple=(mode == 'multiple'), budget=budget)
+        else:
+            raise ValueError(f"Unknown 2-opt mode: {mode}")
+
+
+    def two_opt_sequential(self, budget):
+        """
+        2-opt where every move (reversal of positions i..j) is scored by the four edges it changes.
+        The reversal is only applied, in place, when the move improves the route.
+        """
+        distances = self.get_tour_distances()
+        order = list(range(len(self.tour)))
+        length = len(order)
         improved = True
-        while improved:
+        while improved and not budget.expired():
             improved = False
-            for i in range(1, len(self.nodes) - 2):
-                for j in range(i + 1, len(self.nodes) - 1):
-                    new_route = self.nodes[:i] + self.nodes[i:j+1][::-1] + self.nodes[j+1:]
-                    new_distance = self.calculate_route_distance(new_route)
-                    if new_distance < self.fitness:
-                        self.nodes = new_route
-                        self.fitness = new_distance
+            for i in range(1, length - 2):
+                if budget.expired():
+                    break
+                for j in range(i + 1, length - 1):
+                    a, b, c, d = order[i - 1], order[i], order[j], order[j + 1]
+                    delta = distances[a][c] + distances[b][d] - distances[a][b] - distances[c][d]
+                    if delta < -1e-9:
+                        order[i:j + 1] = order[i:j + 1][::-1]
                         improved = True
+        self.set_order(order)
+
+
+    def two_opt_batched(self, apply_multiple, budget):
+        """
+        2-opt where the gain of every move (i, j) is computed at once with fancy indexing into the route distances.
+        Applies the best move, or if apply_multiple is set, greedily the best improving moves of each start position
+        that do not share edges (their gains add up because they touch disjoint parts of the route),
+        until no move improves the route.
+        """
+        length = len(self.tour)
+        if length < 5:
+            return
+        distances = np.asarray(self.instance.distance_matrix[np.ix_(self.tour, self.tour)], dtype=np.float64)
+        order = np.arange(length)
+        i = np.arange(1, length - 2)[:, None]
+        j = np.arange(2, length - 1)[None, :]
+        valid = j > i
+        while not budget.expired():
+            previous_nodes, first_nodes = order[i - 1], order[i]
+            last_nodes, next_nodes = order[j], order[j + 1]
+            delta = (distances[previous_nodes, last_nodes] + distances[first_nodes, next_nodes]
+                     - distances[previous_nodes, first_nodes] - distances[last_nodes, next_nodes])
+            delta = np.where(valid, delta, np.inf)
+            if delta.min() >= -1e-9:
+                break
+
+            if not apply_multiple:
+                row, column = np.unravel_index(np.argmin(delta), delta.shape)
+                moves = [(row + 1, column + 2)]
+            else:
+                # Best move of every start position i, sorted by gain
+                columns = np.argmin(delta, axis=1)
+                rows = np.nonzero(delta[np.arange(len(columns)), columns] < -1e-9)[0]
+                columns = columns[rows]
+                sorted_moves = np.argsort(delta[rows, columns], kind='stable')
+                # Edge p joins positions p and p + 1. A move (i, j) uses the edges i - 1 ... j
+                used_edges = np.zeros(length - 1, dtype=bool)
+                moves = []
+                for move in sorted_moves:
+                    start, end = rows[move] + 1, columns[move] + 2
+                    if not used_edges[start - 1:end + 1].any():
+                        used_edges[start - 1:end + 1] = True
+                        moves.append((start, end))
+            for start, end in moves:
+                order[start:end + 1] = order[start:end + 1][::-1].copy()
+        self.set_order(order)
 
 
     # Functions to apply 3-opt optimization on a single route
-    def three_opt(self):
-        """Applies 3-opt optimization on the given route."""
+    def three_opt(self, budget=None):
+        """Applies 3-opt optimization on the given route until no move improves it or the budget expires."""
+        if budget is None:
+            budget = Budget()
+        distances = self.get_tour_distances()
+        order = list(range(len(self.tour)))
         improvement = True
-        while improvement:
+        while improvement and not budget.expired():
             improvement = False
-            for i in range(1, len(self.nodes) - 2):
-                for j in range(i + 1, len(self.nodes) - 1):
-                    for k in range(j + 2, len(self.nodes) + (i > 0)):
-                        delta = self.reverse_segment_if_better(i, j, k)
+            for i in range(1, len(order) - 2):
+                if budget.expired():
+                    break
+                for j in range(i + 1, len(order) - 1):
+                    # The depot closes the route at the last position, so k never goes past it
+                    for k in range(j + 2, len(order)):
+                        delta = self.reverse_segment_if_better(order, distances, i, j, k)
                         if delta < 0:
                             improvement = True
-                            self.fitness += delta
+        self.set_order(order)
 
 
-    def reverse_segment_if_better(self, i, j, k):
+    def reverse_segment_if_better(self, order, distances, i, j, k):
         """Reverses segment if it improves the total distance."""
         # Adjust indices for 0-based indexing and get nodes
-        A, B, C, D, E, F = self.nodes[i-1], self.nodes[i], self.nodes[j-1], self.nodes[j], self.nodes[k-1], self.nodes[k % len(self.nodes)]
-        distance_matrix = self.instance.distance_matrix
-        d0 = distance_matrix[A.id, B.id] + distance_matrix[C.id, D.id] + distance_matrix[E.id, F.id]
-        d1 = distance_matrix[A.id, C.id] + distance_matrix[B.id, D.id] + distance_matrix[E.id, F.id]
-        d2 = distance_matrix[A.id, B.id] + distance_matrix[C.id, E.id] + distance_matrix[D.id, F.id]
-        d3 = distance_matrix[A.id, D.id] + distance_matrix[E.id, B.id] + distance_matrix[C.id, F.id]
-        d4 = distance_matrix[F.id, B.id] + distance_matrix[C.id, D.id] + distance_matrix[E.id, A.id]
+        A, B, C, D, E, F = order[i-1], order[i], order[j-1], order[j], order[k-1], order[k]
+        d0 = distances[A][B] + distances[C][D] + distances[E][F]
+        d1 = distances[A][C] + distances[B][D] + distances[E][F]
+        d2 = distances[A][B] + distances[C][E] + distances[D][F]
+        d3 = distances[A][D] + distances[E][B] + distances[C][F]
+        d4 = distances[F][B] + distances[C][D] + distances[E][A]
 
         if d0 > d1:
-            self.nodes[i:j] = reversed(self.nodes[i:j])
+            order[i:j] = reversed(order[i:j])
             return -d0 + d1
         elif d0 > d2:
-            self.nodes[j:k] = reversed(self.nodes[j:k])
+            order[j:k] = reversed(order[j:k])
             return -d0 + d2
         elif d0 > d4:
-            self.nodes[i:k] = reversed(self.nodes[i:k])
+            order[i:k] = reversed(order[i:k])
             return -d0 + d4
         elif d0 > d3:
-            tmp = self.nodes[j:k] + self.nodes[i:j]
-            self.nodes[i:k] = tmp
+            tmp = order[j:k] + order[i:j]
+            order[i:k] = tmp
             return -d0 + d3
         return 0
 
 
     # Functions to apply 3-opt in fisrt improvement
-    def three_opt_first_improvement(self, max_segment_length=10):
-        """Applies a limited 3-opt search that looks for the first improvement."""
-        length = len(self.nodes)
+    def three_opt_first_improvement(self, max_segment_length=10, budget=None):
+        """
+        Applies a limited 3-opt search where the segments B = [i, j) and C = [j, k) are at most max_segment_length
+        positions long. Every reconnection of A B C D is scored from the six edge costs and only the best one is
+        applied when it improves the route; the scan then continues with the updated route instead of restarting.
+        The search stops when the budget expires.
+        """
+        if budget is None:
+            budget = Budget()
+        distances = self.get_tour_distances()
+        order = list(range(len(self.tour)))
+        length = len(order)
         improved = True
-        while improved:
+        while improved and not budget.expired():
             improved = False
             for i in range(1, length - 2):
+                if budget.expired():
+                    break
                 for j in range(i + 1, min(i + max_segment_length, length - 1)):
                     for k in range(j + 1, min(j + max_segment_length, length)):
-                        # Save the current state to compare after potential improvements
-                        before_change = self.fitness
-                        # Try reversing the segments and see if it improves the route
-                        self.reverse_segment_if_improves(i, j)
-                        self.reverse_segment_if_improves(j, k)
-
-                        # Recalculate fitness after the changes
-                        after_change = self.calculate_route_distance()
-
-                        # Check if there was an improvement
-                        if after_change < before_change:
-                            self.fitness = after_change  # Update the fitness with the improved distance
+                        if self.apply_best_three_opt_move(order, distances, i, j, k):
                             improved = True
-                            break  # Exit the innermost loop on the first improvement
-                        else:
-                            # Revert changes if no improvement
-                            self.reverse_segment_if_improves(j, k)  # Revert previous reversal
-                            self.reverse_segment_if_improves(i, j)  # Revert first reversal
-                    if improved:
-                        break  # Break the second loop if improved
-                if improved:
-                    break  # Break the outer loop if improved
+        self.set_order(order)
 
 
-    def reverse_segment_if_improves(self, start, end):
-        """Reverses the segment in the route if it results in an improvement."""
-        self.nodes[start:end] = self.nodes[start:end][::-1]
+    def apply_best_three_opt_move(self, order, distances, i, j, k):
+        """
+        Scores the seven reconnections of the segments B = order[i:j] and C = order[j:k] (' means reversed)
+        and applies the best one if it shortens the route. Returns True if a move was applied.
+        """
+        a, b, c, d, e, f = order[i - 1], order[i], order[j - 1], order[j], order[k - 1], order[k]
+        current = distances[a][b] + distances[c][d] + distances[e][f]
+        moves = (
+            (distances[a][c] + distances[b][d] + distances[e][f], 1),  # B' C
+            (distances[a][b] + distances[c][e] + distances[d][f], 2),  # B C'
+            (distances[a][c] + distances[b][e] + distances[d][f], 3),  # B' C'
+            (distances[a][d] + distances[e][b] + distances[c][f], 4),  # C B
+            (distances[a][d] + distances[e][c] + distances[b][f], 5),  # C B'
+            (distances[a][e] + distances[d][b] + distances[c][f], 6),  # C' B
+            (distances[a][e] + distances[d][c] + distances[b][f], 7),  # C' B'
+        )
+        best_cost, best_move = min(moves)
+        if best_cost >= current - 1e-9:
+            return False
 
+        B, C = order[i:j], order[j:k]
+        if best_move == 1:
+            order[i:k] = B[::-1] + C
+        elif best_move == 2:
+            order[i:k] = B + C[::-1]
+        elif best_move == 3:
+            order[i:k] = B[::-1] + C[::-1]
+        elif best_move == 4:
+            order[i:k] = C + B
+        elif best_move == 5:
+            order[i:k] = C + B[::-1]
+        elif best_move == 6:
+            order[i:k] = C[::-1] + B
+        else:
+            order[i:k] = C[::-1] + B[::-1]
+        return True
 
-    def lin_kernighan(self, max_iter, max_time_seconds):              
+
+    def lin_kernighan(self, max_iter, max_time_seconds, max_depth=6, budget=None):
+        """
+        Lin-Kernighan style improver. The route is handled as a cycle that starts and ends at the depot and is
+        improved with two kinds of moves, both driven by neighbour lists and don't-look bits:
+        - Sequential exchanges: starting from an edge (t1, t2), 2-opt moves are chained while the partial gain
+          stays positive, and the chain is cut at the depth with the best closing gain.
+        - Or-opt: segments of 1 to 3 consecutive nodes are moved, in any orientation, next to one of their neighbours.
+        Stops when no node can be improved, after max_iter improving moves, after max_time_seconds or when the budget expires.
+        """
         start_time = time.time() # Record the start time of the algorithm to enforce a time limit
-        
-        # Initialize the improvement flag and iteration counter
-        improved = True
+        if budget is None:
+            budget = Budget()
+        cycle_length = len(self.tour) - 1 # The depot at the end closes the cycle
+        if cycle_length < 4:
+            return
+
+        distances = self.get_tour_distances()
+        cycle = list(range(cycle_length))
+        position = list(range(cycle_length))
+        neighbors_size = min(self.parameters.neighbors_size, cycle_length - 1)
+        neighbors = [sorted((other for other in range(cycle_length) if other != node), key=distances[node].__getitem__)[:neighbors_size] for node in range(cycle_length)]
+
+        # Don't-look bits: only the nodes in the queue are evaluated
+        queue = deque(range(cycle_length))
+        in_queue = [True] * cycle_length
         total_iterations = 0
-        # Continue optimizing until no improvement is found, the max number of iterations is reached, or the max time allowed is exceeded
-        while improved and total_iterations < max_iter and (time.time() - start_time) < max_time_seconds:                                
-            improved = False  # Reset the improvement flag for this iteration
-
-            # Iterate over all pairs of nodes within the route, except for the first and last edges
-            for i in range(1, len(self.nodes) - 2):
-                for j in range(i + 1, len(self.nodes) - 1):
-                    
-                    # If the maximum time allowed for the algorithm has been exceeded, terminate and return
-                    if (time.time() - start_time) > max_time_seconds:
-                        print("Max time reached")
-                        return
-
-                    # Create a new route by reversing the segment between nodes i and j
-                    new_route = self.nodes[:i] + self.nodes[i:j+1][::-1] + self.nodes[j+1:]
-                    
-                    # If the new route has a shorter distance than the current route, update the route and its fitness
-                    if self.calculate_route_distance(new_route) < self.calculate_route_distance():
-                        self.nodes = new_route
-                        self.fitness = self.calculate_route_distance()
-                        improved = True  # Set the improvement flag
-                        break  # Break out of the inner loop early due to improvement
-
-                # If an improvement was found, break out of the second loop early
-                if improved:
+        while queue and total_iterations < max_iter:
+            if (time.time() - start_time) > max_time_seconds or budget.expired():
+                print("Max time reached")
+                break
+            t1 = queue.popleft()
+            in_queue[t1] = False
+            touched = self.lin_kernighan_step(t1, cycle, position, distances, neighbors, max_depth)
+            if not touched:
+                touched = self.or_opt_step(t1, cycle, position, distances, neighbors)
+            if touched:
+                total_iterations += 1
+                for node in touched:
+                    if not in_queue[node]:
+                        queue.append(node)
+                        in_queue[node] = True
+
+        # Rotate the cycle to start at the depot and close it again with the depot
+        depot_position = position[0]
+        order = cycle[depot_position:] + cycle[:depot_position] + [cycle_length]
+        self.set_order(order)
+
+
+    def lin_kernighan_step(self, t1, cycle, position, distances, neighbors, max_depth):
+        """
+        Tries a chain of sequential 2-opt moves that starts breaking each of the two edges of t1.
+        Returns the nodes whose edges changed, or an empty list if the cycle could not be improved.
+        """
+        length = len(cycle)
+        for forward in (True, False):
+            initial_cycle = cycle[:]
+            t2 = cycle[(position[t1] + (1 if forward else -1)) % length]
+            gain = distances[t1][t2]
+            best_gain, best_cycle = 1e-9, None
+            touched = [t1, t2]
+            for _ in range(max_depth):
+                # In the current orientation t2 follows t1
+                step = 1 if cycle[(position[t1] + 1) % length] == t2 else -1
+                t2_next = cycle[(position[t2] + step) % length]
+                best_move = None
+                for t3 in neighbors[t2]:
+                    partial_gain = gain - distances[t2][t3]
+                    if partial_gain <= 0:
+                        break
+                    if t3 == t1 or t3 == t2_next or t3 in touched:
+                        continue
+                    t4 = cycle[(position[t3] - step) % length]
+                    value = partial_gain + distances[t3][t4]
+                    if best_move is None or value > best_move[0]:
+                        best_move = (value, t3, t4)
+                if best_move is None:
                     break
 
-            # Increment the total number of iterations after each complete pass through the route
-            total_iterations += 1
+                # Remove (t1, t2) and (t4, t3), add (t2, t3) and (t4, t1): reverse the path t2 ... t4
+                gain, t3, t4 = best_move
+                if step == 1:
+                    self.reverse_cycle(cycle, position, position[t2], position[t4])
+                else:
+                    self.reverse_cycle(cycle, position, position[t4], position[t2])
+                touched.extend((t3, t4))
+                closing_gain = gain - distances[t4][t1]
+                if closing_gain > best_gain:
+                    best_gain, best_cycle = closing_gain, cycle[:]
+                t2 = t4
+
+            # Keep the chain up to its best closing gain, or undo it completely
+            cycle[:] = best_cycle if best_cycle is not None else initial_cycle
+            for index, node in enumerate(cycle):
+                position[node] = index
+            if best_cycle is not None:
+                return touched
+        return []
+
+
+    def reverse_cycle(self, cycle, position, start, end):
+        """
+        Reverses the nodes of the cycle between positions start and end (both included, wrapping around).
+        The complementary path is reversed instead when it is shorter, which gives the same cycle.
+        """
+        length = len(cycle)
+        inner = (end - start) % length + 1
+        if 2 * inner > length:
+            start, end = (end + 1) % length, (start - 1) % length
+            inner = length - inner
+        for _ in range(inner // 2):
+            first, second = cycle[start], cycle[end]
+            cycle[start], position[second] = second, start
+            cycle[end], position[first] = first, end
+            start = (start + 1) % length
+            end = (end - 1) % length
+
+
+    def or_opt_step(self, node, cycle, position, distances, neighbors, max_segment_length=3):
+        """
+        Tries to move a segment of 1 to max_segment_length nodes that starts at node next to one of the neighbours
+        of its ends. Returns the nodes whose edges changed, or an empty list if the cycle could not be improved.
+        """
+        length = len(cycle)
+        for segment_length in range(1, min(max_segment_length, length - 3) + 1):
+            start = position[node]
+            segment = [cycle[(start + offset) % length] for offset in range(segment_length)]
+            first, last = segment[0], segment[-1]
+            previous_node = cycle[(start - 1) % length]
+            next_node = cycle[(start + segment_length) % length]
+            removal_gain = distances[previous_node][first] + distances[last][next_node] - distances[previous_node][next_node]
+            if removal_gain <= 1e-9:
+                continue
+
+            best_move = None
+            for end_node in (first, last):
+                for neighbor in neighbors[end_node]:
+                    if neighbor in segment:
+                        continue
+                    # Insert between neighbor and its successor, or its predecessor and neighbor
+                    for other in (cycle[(position[neighbor] + 1) % length], cycle[(position[neighbor] - 1) % length]):
+                        if other in segment:
+                            continue
+                        insertion_cost = distances[neighbor][end_node] + distances[segment[-1] if end_node == first else first][other] - distances[neighbor][other]
+                        delta = insertion_cost - removal_gain
+                        if delta < -1e-9 and (best_move is None or delta < best_move[0]):
+                            best_move = (delta, neighbor, other, end_node)
+            if best_move is None:
+                continue
+
+            # Rebuild the cycle: neighbor, end_node ... opposite end, other
+            _, neighbor, other, end_node = best_move
+            remaining = [cycle[(start + segment_length + offset) % length] for offset in range(length - segment_length)]
+            inserted = segment if end_node == first else segment[::-1]
+            index = remaining.index(neighbor)
+            if remaining[(index + 1) % len(remaining)] == other:
+                remaining[index + 1:index + 1] = inserted
+            else:
+                remaining[index:index] = inserted[::-1]
+            cycle[:] = remaining
+            for index, cycle_node in enumerate(cycle):
+                position[cycle_node] = index
+            return segment + [previous_node, next_node, neighbor, other]
+        return []
+
+
+    # Exact solution of short routes
+    def held_karp(self):
+        """
+        Optimal order of the route with the Held-Karp dynamic programming, vectorized over the subsets of each size.
+        cost[mask, j] is the shortest path that starts at the depot, visits the customers in mask and ends at customer j.
+        Memory and time grow as 2^n * n^2, use it only for short routes (see 'exact_route_max_nodes').
+        """
+        customers = self.tour[1:-1]
+        size = len(customers)
+        if size < 3:
+            self.fitness = self.calculate_route_distance()
+            return
+        distances = np.asarray(self.get_tour_distances(), dtype=np.float64)
+        from_depot = distances[0, 1:-1]
+        between = distances[1:-1, 1:-1]
+
+        subsets = 1 << size
+        bits = 1 << np.arange(size)
+        cost = np.full((subsets, size), np.inf)
+        parent = np.full((subsets, size), -1, dtype=np.int8)
+        cost[bits, np.arange(size)] = from_depot
+
+        masks = np.arange(subsets)
+        subset_sizes = np.zeros(subsets, dtype=np.int64)
+        for bit in bits:
+            subset_sizes += (masks & bit) > 0
+        for subset_size in range(2, size + 1):
+            layer = masks[subset_sizes == subset_size]
+            previous = layer[:, None] ^ bits[None, :] # Subset without the last customer j, (masks, j)
+            # candidates[m, j, k] = cost[previous[m, j], k] + between[k, j]
+            candidates = cost[previous] + between.T[None, :, :]
+            best = np.argmin(candidates, axis=2)
+            best_cost = np.take_along_axis(candidates, best[:, :, None], axis=2)[:, :, 0]
+            contains = (layer[:, None] & bits[None, :]) > 0
+            cost[layer] = np.where(contains, best_cost, np.inf)
+            parent[layer] = np.where(contains, best, -1)
+
+        full = subsets - 1
+        last = int(np.argmin(cost[full] + distances[1:-1, -1]))
+        order = list()
+        mask = full
+        while last >= 0:
+            order.append(last)
+            mask, last = mask ^ (1 << last), int(parent[mask, last])
+        order.reverse()
+        self.tour = np.concatenate(([self.tour[0]], customers[order], [self.tour[-1]])).astype(self.tour.dtype)
+        self.fitness = self.calculate_route_distance()
+
+
+    def optimise(self, max_time_seconds=60):
+        """
+        Intra-route improvement pipeline: 2-opt, 3-opt first improvement, 3-opt and Lin-Kernighan, all of them
+        stopped when max_time_seconds are over. Routes with up to 'exact_route_max_nodes' customers are solved to
+        optimality with Held-Karp instead.
+
+        Output:
+            - True if every step finished before max_time_seconds, False if the pipeline was cut short
+        """
+        if len(self.tour) - 2 <= self.parameters.exact_route_max_nodes:
+            self.held_karp()
+            return True
+        budget = Budget(deadline=time.time() + max(0.0, max_time_seconds))
+        self.two_opt(budget=budget) # Apply 2-opt
+        self.three_opt_first_improvement(budget=budget) # Apply 3-opt first improvent
+        self.three_opt(budget=budget) # Apply 3-opt
+        if budget.expired():
+            return False
+        self.lin_kernighan(max_iter=10000, max_time_seconds=budget.remaining(), budget=budget) # Apply lin_kernighan
+        return not budget.expired()
 
 
     def __str__(self) -> str:
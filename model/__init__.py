@@ -1,5 +1,8 @@
 from .Individual import Individual
+from .LocalSearch import LocalSearch
 from .Node import Node
+from .NearestNeighborSearch import NearestNeighborSearch
+from .NodeStore import NodeStore
 from .Population import Population
 from .Route import Route
 from .Vehicle import Vehicle
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+# The packages (algorithm, model, utils) are imported from the repository root, like main.py does
+REPOSITORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPOSITORY_PATH)
+
+import algorithm
+
+
+@pytest.fixture(scope='module')
+def instance(tmp_path_factory):
+    """
+    Instance of the input files, built once per test module with its output files in a temporary folder
+    """
+    # Parameters and input files are read with paths relative to the repository root
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(REPOSITORY_PATH)
+        parameters = algorithm.Parameters()
+        parameters.output_file_path = str(tmp_path_factory.mktemp('output')) + '/'
+        yield algorithm.Instance(parameters)
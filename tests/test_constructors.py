@@ -0,0 +1,117 @@
+import random
+import numpy as np
+import pytest
+
+import model
+
+
+def create_tight_instance(instance, size=80, n_vehicles=8, slack=1.03, seed=0):
+    """
+    Sub instance of 'size' random customers and 'n_vehicles' vehicles whose total capacity is the demand plus a 'slack' factor
+    """
+    rng = np.random.default_rng(seed)
+    items = instance.nodes_df['Items'].to_numpy()
+    node_ids = np.sort(rng.choice(np.arange(1, len(items)), size=size, replace=False))
+    fleet_df = instance.fleet_df.iloc[:n_vehicles].copy()
+    fleet_df['Capacity'] = int(np.ceil(items[node_ids].sum() * slack / n_vehicles))
+    return instance.create_sub_instance(node_ids, fleet_df)[0]
+
+
+def assign_hierarchical_baseline(instance, client_indices, routes_labels):
+    """
+    Original client by client assignment of the hierarchical clustering constructor
+    """
+    vehicle_ids = instance.fleet_df['Id'].tolist()
+    routes = {vehicle_id: [] for vehicle_id in vehicle_ids}
+    vehicle_loads = {vehicle_id: 0 for vehicle_id in vehicle_ids}
+    vehicle_capacities = dict(zip(vehicle_ids, instance.fleet_df['Capacity'].tolist()))
+    label_to_vehicle_id = {label: vehicle_id for label, vehicle_id in zip(np.unique(routes_labels), vehicle_ids)}
+    for client_idx, label in zip(client_indices, routes_labels):
+        client_demand = instance.nodes_df.at[client_idx, 'Items']
+        vehicle_id = label_to_vehicle_id[label]
+        if vehicle_loads[vehicle_id] + client_demand <= vehicle_capacities[vehicle_id]:
+            routes[vehicle_id].append(client_idx)
+            vehicle_loads[vehicle_id] += client_demand
+        else:
+            for other_vehicle_id in vehicle_ids:
+                if vehicle_loads[other_vehicle_id] + client_demand <= vehicle_capacities[other_vehicle_id]:
+                    routes[other_vehicle_id].append(client_idx)
+                    vehicle_loads[other_vehicle_id] += client_demand
+                    break
+            else:
+                raise ValueError(f"No vehicle with enough capacity for client {client_idx}")
+    return {vehicle_id: [instance.nodes_df.at[idx, 'Id'] for idx in route] for vehicle_id, route in routes.items()}
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_hierarchical_clustering_matches_baseline_assignment_for_fixed_labels(instance, monkeypatch, seed):
+    sub_instance = create_tight_instance(instance, slack=1.3, seed=seed)
+    client_indices = sub_instance.nodes_df[sub_instance.nodes_df['Node_Type'] != 'Depot'].index.tolist()
+    routes_labels = np.random.default_rng(seed).integers(1, len(sub_instance.fleet_df) + 1, size=len(client_indices))
+    individual = model.Individual(sub_instance.parameters, sub_instance)
+    monkeypatch.setattr(individual, 'get_hierarchical_clusters', lambda client_indices, n_clusters: routes_labels)
+
+    routes = individual.initialize_routes_hierarchical_clustering()
+
+    # Random labels overflow several vehicles, so the clients after the first overflow are reassigned
+    assert routes == assign_hierarchical_baseline(sub_instance, client_indices, routes_labels)
+
+
+def assert_serves_every_customer(instance, routes):
+    """
+    Every customer is in exactly one route and no vehicle is loaded over its capacity
+    """
+    customers = sorted(node_id for route in routes.values() for node_id in route)
+    assert customers == instance.nodes_df['Id'].iloc[1:].tolist()
+    items = instance.nodes_df['Items'].to_numpy()
+    capacities = dict(zip(instance.fleet_df['Id'], instance.fleet_df['Capacity']))
+    for vehicle_id, route in routes.items():
+        assert items[route].sum() <= capacities[vehicle_id]
+
+
+@pytest.mark.parametrize('constructor', ['initialize_routes_clarke_wright', 'initialize_routes_sweep', 'initialize_routes_compact_kmeans'])
+@pytest.mark.parametrize('seed', range(5))
+def test_constructor_serves_every_customer_on_a_tight_instance(instance, constructor, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    sub_instance = create_tight_instance(instance, slack=1.03, seed=seed)
+    individual = model.Individual(sub_instance.parameters, sub_instance)
+
+    routes = getattr(individual, constructor)()
+
+    assert_serves_every_customer(sub_instance, routes)
+
+
+def test_regret_assignment_repairs_fragmented_capacity(instance):
+    individual = model.Individual(instance.parameters, instance)
+    # The greedy rounds pack 5 + 3 in each cluster, the item of 4 only fits if the clusters become 5 + 5 and 3 + 3 + 4
+    costs = np.array([[0, 5], [5, 0], [0, 5], [5, 0], [0, 0.1]], dtype=np.float64)
+    demands = np.array([5, 5, 3, 3, 4])
+    capacities = np.array([10, 10])
+
+    labels = individual.assign_clusters_regret(costs, demands, capacities)
+
+    assert np.all(labels >= 0)
+    assert np.all(np.bincount(labels, weights=demands, minlength=len(capacities)) <= capacities)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_neighbor_search_returns_the_nearest_unvisited_node(instance, seed):
+    rng = np.random.default_rng(seed)
+    customers = instance.nodes_df['Id'].iloc[1:].to_numpy()
+    search = model.NearestNeighborSearch(instance.parameters, instance, customers)
+    unvisited = set(customers.tolist())
+    node = 0
+    # Visit the customers in a random order, down to the last ones where the candidate lists are all visited
+    for next_node in rng.permutation(customers)[:-1]:
+        search.visit(next_node)
+        unvisited.discard(int(next_node))
+        node = int(next_node)
+        distances = np.asarray(instance.distance_matrix[node])
+        expected_distance = min(distances[list(unvisited)])
+
+        nearest_node, distance = search.nearest(node)
+
+        assert distance == expected_distance
+        assert nearest_node == min(other for other in unvisited if distances[other] == expected_distance)
+    assert search.get_unvisited_nodes() == unvisited
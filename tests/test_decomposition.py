@@ -0,0 +1,32 @@
+import copy
+import numpy as np
+import pytest
+
+import algorithm
+
+
+@pytest.mark.parametrize('mode', ['region', 'province', 'angular', 'kmeans'])
+def test_mixed_fleet_covers_the_demand_of_every_sector(instance, mode):
+    mixed_instance = copy.copy(instance)
+    mixed_instance.fleet_df = instance.fleet_df.copy()
+    mixed_instance.fleet_df['Capacity'] = np.where(np.arange(len(instance.fleet_df)) % 3 == 0, 9000, 3000)
+    parameters = copy.copy(instance.parameters)
+    parameters.decomposition_mode = mode
+    decomposition = algorithm.Decomposition(parameters, mixed_instance)
+
+    sectors, fleets = decomposition.merge_sectors(decomposition.create_sectors())
+
+    node_store = mixed_instance.node_store
+    for node_ids, fleet_df in zip(sectors, fleets):
+        assert fleet_df['Capacity'].sum() >= node_store.items[node_store.positions[node_ids]].sum()
+    vehicle_ids = np.concatenate([fleet_df['Id'].to_numpy() for fleet_df in fleets])
+    assert sorted(vehicle_ids.tolist()) == sorted(mixed_instance.fleet_df['Id'].tolist())
+
+
+def test_fleet_smaller_than_the_demand_raises(instance):
+    small_instance = copy.copy(instance)
+    small_instance.fleet_df = instance.fleet_df.iloc[:2]
+    decomposition = algorithm.Decomposition(instance.parameters, small_instance)
+
+    with pytest.raises(ValueError):
+        decomposition.allocate_fleet(decomposition.create_sectors())
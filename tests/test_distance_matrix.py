@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from utils import DistanceMatrix
+
+
+def create_matrices(storage, size=30, seed=0):
+    """
+    Random symmetric matrix of whole kilometers with a zero diagonal and its DistanceMatrix in a given storage
+    """
+    rng = np.random.default_rng(seed)
+    dense = np.triu(rng.integers(1, 20000, size=(size, size)), 1).astype(np.float64)
+    dense = dense + dense.T
+    distance_matrix = DistanceMatrix(size, storage)
+    distance_matrix.set_block(0, size, dense)
+    return dense, distance_matrix
+
+
+@pytest.mark.parametrize('storage', ['integer', 'condensed'])
+def test_indexing_matches_the_dense_matrix(storage):
+    dense, distance_matrix = create_matrices(storage)
+    rows = np.array([3, 0, 17, 3, 29, -1])
+    columns = np.array([5, 0, 2, 3, 11, -2])
+    mask = np.arange(len(dense)) % 3 == 0
+    keys = [
+        (4, 9), (9, 4), (7, 7), (-1, 2),  # Single distances
+        5, -3, (5, slice(None)), (slice(None), 5),  # Rows and columns
+        (slice(2, 20, 3), slice(None, 10)), (slice(None), slice(None)),  # Slices
+        mask, (mask, slice(None)), (slice(None), mask), (mask, 4),  # Boolean masks
+        rows, (rows, columns), (rows, 4), (4, columns), (rows[:, None], columns[None, :]),  # Integer arrays
+        np.ix_(rows, columns), np.ix_(mask, rows),  # Blocks
+    ]
+    for key in keys:
+        np.testing.assert_array_equal(distance_matrix[key], dense[key], err_msg=str(key))
+    np.testing.assert_array_equal(np.asarray(distance_matrix), dense)
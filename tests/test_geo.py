@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pandas as pd
+
+from utils import Geo
+
+NODES_FILE = os.path.join(os.path.dirname(__file__), '..', 'input_files', 'nodes.csv')
+
+
+def get_instance_coordinates(size=60, seed=0):
+    """
+    Sample of the (latitude, longitude) coordinates of the instance nodes
+    """
+    nodes_df = pd.read_csv(NODES_FILE, sep=';', decimal=',', encoding='latin-1')
+    coordinates = nodes_df[['Latitude', 'Longitude']].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    return coordinates[rng.choice(len(coordinates), size=min(size, len(coordinates)), replace=False)]
+
+
+def calculate_pairwise(geo, coordinates_from, coordinates_to):
+    """
+    Original pair by pair geopy distances rounded up with math.ceil
+    """
+    return np.array([[geo.calculate_distance(tuple(coord1), tuple(coord2)) for coord2 in coordinates_to] for coord1 in coordinates_from])
+
+
+def test_vincenty_matrix_matches_geopy_on_instance_coordinates():
+    geo = Geo()
+    coordinates = get_instance_coordinates()
+    expected = calculate_pairwise(geo, coordinates, coordinates)
+    np.testing.assert_array_equal(geo.calculate_distance_matrix(coordinates, mode='vincenty'), expected)
+
+
+def test_vincenty_matrix_matches_geopy_on_antipodal_and_near_identical_points():
+    geo = Geo()
+    base = get_instance_coordinates(size=5, seed=1)
+    coordinates_from = np.vstack((
+        base,
+        [[0.0, 0.0], [10.0, 20.0], [0.0, 0.0], [45.0, 90.0], [40.4, -3.7], [-33.9, 151.2]],
+    ))
+    coordinates_to = np.vstack((
+        base + 1e-7,  # Near-identical points
+        [[0.0, 180.0], [-10.0, -160.0], [0.5, 179.5], [-45.0, -90.0], [40.4, -3.7], [33.9, -28.8]],  # Antipodal and nearly antipodal points, one identical
+    ))
+    expected = calculate_pairwise(geo, coordinates_from, coordinates_to)
+    np.testing.assert_array_equal(geo.calculate_distance_matrix(coordinates_from, coordinates_to, mode='vincenty'), expected)
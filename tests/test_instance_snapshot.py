@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pandas as pd
+
+from utils import InstanceSnapshot
+
+
+def test_round_trip_returns_equal_data(tmp_path):
+    instance_snapshot = InstanceSnapshot(str(tmp_path))
+    nodes_df = pd.DataFrame({
+        'Id': np.arange(4),
+        'Latitude': [40.35, 41.38, 37.38, np.nan],
+        'Name': ['Depot', 'Hospital A', np.nan, 'Hospital C'],
+        'Zip_Code': ['28670', 8036, 41013, None],  # Mixed types
+    })
+    fleet_df = pd.DataFrame({'Id': [1, 2], 'Capacity': [5500, 3000], 'Name': ['1111AAA', '1112AAA']})
+    distance_matrix = np.arange(6, dtype=np.uint16)
+    candidates = {3: np.array([[0, 1, 2], [1, 0, 3], [2, 3, 0], [3, 2, 1]], dtype=np.int32)}
+
+    instance_snapshot.save('key', nodes_df, fleet_df, distance_matrix, candidates)
+    snapshot = instance_snapshot.load('key')
+
+    pd.testing.assert_frame_equal(snapshot['nodes_df'], nodes_df, check_dtype=False)
+    assert snapshot['nodes_df']['Zip_Code'].map(type).tolist() == nodes_df['Zip_Code'].map(type).tolist()
+    pd.testing.assert_frame_equal(snapshot['fleet_df'], fleet_df, check_dtype=False)
+    np.testing.assert_array_equal(snapshot['distance_matrix'], distance_matrix)
+    assert snapshot['distance_matrix'].dtype == distance_matrix.dtype
+    np.testing.assert_array_equal(snapshot['candidates'][3], candidates[3])
+    # Nothing is pickled: every array loads with allow_pickle=False
+    folder = instance_snapshot.get_folder('key')
+    for file_name in os.listdir(folder):
+        if file_name.endswith('.npy'):
+            assert np.load(os.path.join(folder, file_name), allow_pickle=False).dtype != object
+
+
+def test_round_trip_of_the_instance_returns_equal_data(tmp_path, instance):
+    instance_snapshot = InstanceSnapshot(str(tmp_path))
+    distance_matrix = np.asarray(instance.distance_matrix)
+
+    instance_snapshot.save('key', instance.nodes_df, instance.fleet_df, distance_matrix, {})
+    snapshot = instance_snapshot.load('key')
+
+    pd.testing.assert_frame_equal(snapshot['nodes_df'], instance.nodes_df)
+    pd.testing.assert_frame_equal(snapshot['fleet_df'], instance.fleet_df)
+    np.testing.assert_array_equal(snapshot['distance_matrix'], distance_matrix)
+
+
+def test_missing_snapshot_returns_none(tmp_path):
+    assert InstanceSnapshot(str(tmp_path)).load('key') is None
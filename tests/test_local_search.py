@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import model
+
+
+def create_random_individual(instance, size=60, n_vehicles=6, seed=0):
+    """
+    Individual of a sub instance with 'size' random customers split in random routes of 'n_vehicles' vehicles
+    with 50% more capacity than the demand
+    """
+    rng = np.random.default_rng(seed)
+    items = instance.nodes_df['Items'].to_numpy()
+    node_ids = rng.choice(np.arange(1, len(items)), size=size, replace=False)
+    fleet_df = instance.fleet_df.iloc[:n_vehicles].copy()
+    fleet_df['Capacity'] = int(np.ceil(items[node_ids].sum() * 1.5 / n_vehicles))
+    sub_instance = instance.create_sub_instance(node_ids, fleet_df)[0]
+    individual = model.Individual(sub_instance.parameters, sub_instance)
+    customers = rng.permutation(np.arange(1, size + 1))
+    individual.create_routes_object({vehicle_id: customers[vehicle_index::n_vehicles].tolist() for vehicle_index, vehicle_id in enumerate(sub_instance.fleet_df['Id'])})
+    return individual
+
+
+def calculate_tours_distance(local_search):
+    return sum(np.sum(local_search.distance_matrix[tour[:-1], tour[1:]]) for tour in local_search.tours)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_move_delta_equals_the_recomputed_distance_change(seed, instance):
+    individual = create_random_individual(instance, seed=seed)
+    local_search = model.LocalSearch(individual.parameters, individual.instance, individual.routes)
+    move_types = set()
+    for node in list(local_search.route_of):
+        move = local_search.find_best_move(node)
+        if move is None:
+            continue
+        tours = [list(tour) for tour in local_search.tours]
+        distance = calculate_tours_distance(local_search)
+        loads = [prefix_loads[-1] for prefix_loads in local_search.prefix_loads]
+
+        changed_routes = local_search.apply_move(move)
+
+        assert calculate_tours_distance(local_search) - distance == pytest.approx(move[0])
+        # The random routes may start over capacity, a move never adds load to a route over its capacity
+        for route_index in changed_routes:
+            load = local_search.prefix_loads[route_index][-1]
+            assert load <= local_search.capacities[route_index] or load <= loads[route_index]
+        assert sorted(node for tour in local_search.tours for node in tour[1:-1]) == sorted(node for tour in tours for node in tour[1:-1])
+        move_types.add(move[1])
+        # Back to the random routes for the next customer
+        local_search.tours = tours
+        for route_index in range(len(tours)):
+            local_search.update_route(route_index)
+    assert move_types == {'relocate', 'two_opt_star', 'cross_exchange'}
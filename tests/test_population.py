@@ -0,0 +1,33 @@
+import os
+import time
+import pytest
+
+import algorithm
+import model
+
+REPOSITORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def parameters(tmp_path, monkeypatch):
+    # Parameters and input files are read with paths relative to the repository root
+    monkeypatch.chdir(REPOSITORY_PATH)
+    parameters = algorithm.Parameters()
+    parameters.output_file_path = str(tmp_path) + '/'
+    return parameters
+
+
+@pytest.mark.parametrize('population_workers', [1, 2])
+def test_population_construct_stays_within_time_budget(parameters, population_workers):
+    parameters.time_budget_seconds = 8
+    parameters.population_workers = population_workers
+    parameters.or_tools_portfolio = False
+    instance = algorithm.Instance(parameters)
+
+    start_time = time.time()
+    population = model.Population(parameters, instance)
+    population.construct()
+    wall_time = time.time() - start_time
+
+    assert population.best_individual is not None
+    assert wall_time <= parameters.time_budget_seconds + 1.5
@@ -0,0 +1,112 @@
+import itertools
+import numpy as np
+import pytest
+
+import model
+from utils import Budget
+
+
+def create_route(instance, size=40, seed=0):
+    """
+    Route of the first vehicle that visits 'size' random customers in a random order
+    """
+    rng = np.random.default_rng(seed)
+    customers = rng.choice(np.arange(1, len(instance.nodes_df)), size=size, replace=False)
+    route = model.Route(instance.parameters, instance, instance.fleet_df['Id'].iloc[0])
+    route.tour = np.concatenate(([0], customers, [0])).astype(np.int32)
+    route.fitness = route.calculate_route_distance()
+    return route
+
+
+def assert_improved_permutation(route, tour, fitness):
+    """
+    The route visits the same customers from and to the depot, its fitness is its distance and it is not longer
+    """
+    assert route.tour[0] == route.tour[-1] == 0
+    assert sorted(route.tour[1:-1].tolist()) == sorted(tour[1:-1].tolist())
+    assert route.fitness == pytest.approx(route.calculate_route_distance())
+    assert route.fitness <= fitness + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_two_opt_sequential_returns_an_improved_permutation(instance, seed):
+    route = create_route(instance, seed=seed)
+    tour, fitness = route.tour.copy(), route.fitness
+
+    route.two_opt(mode='sequential', budget=Budget())
+
+    assert_improved_permutation(route, tour, fitness)
+    assert route.fitness < fitness
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_lin_kernighan_returns_an_improved_permutation(instance, seed):
+    route = create_route(instance, seed=seed)
+    tour, fitness = route.tour.copy(), route.fitness
+
+    route.lin_kernighan(max_iter=10000, max_time_seconds=10)
+
+    assert_improved_permutation(route, tour, fitness)
+    assert route.fitness < fitness
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_three_opt_first_improvement_returns_an_improved_permutation(instance, seed):
+    route = create_route(instance, seed=seed)
+    tour, fitness = route.tour.copy(), route.fitness
+
+    route.three_opt_first_improvement()
+
+    assert_improved_permutation(route, tour, fitness)
+    assert route.fitness < fitness
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_three_opt_never_makes_a_two_opt_route_worse(instance, seed):
+    route = create_route(instance, seed=seed)
+    route.two_opt(mode='best')
+    tour, fitness = route.tour.copy(), route.fitness
+
+    route.three_opt()
+
+    assert_improved_permutation(route, tour, fitness)
+
+
+def get_best_two_opt_delta(route):
+    """
+    Best distance change among every reversal of the positions i..j of the tour, evaluated move by move
+    """
+    tour = route.tour.tolist()
+    best_delta = 0.0
+    for i in range(1, len(tour) - 2):
+        for j in range(i + 1, len(tour) - 1):
+            new_tour = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+            best_delta = min(best_delta, route.calculate_route_distance(np.array(new_tour)) - route.fitness)
+    return best_delta
+
+
+@pytest.mark.parametrize('mode', ['best', 'multiple'])
+@pytest.mark.parametrize('seed', range(3))
+def test_batched_two_opt_reaches_a_two_opt_local_optimum(instance, mode, seed):
+    route = create_route(instance, size=25, seed=seed)
+    tour, fitness = route.tour.copy(), route.fitness
+
+    route.two_opt(mode=mode, budget=Budget())
+
+    assert_improved_permutation(route, tour, fitness)
+    assert get_best_two_opt_delta(route) > -1e-6
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_held_karp_matches_brute_force(instance, seed):
+    route = create_route(instance, size=8, seed=seed)
+    tour = route.tour.copy()
+    # Shortest of the tours through every order of the customers
+    orders = np.array(list(itertools.permutations(tour[1:-1])))
+    tours = np.hstack((np.zeros((len(orders), 1), dtype=orders.dtype), orders, np.zeros((len(orders), 1), dtype=orders.dtype)))
+    distances = np.asarray(instance.distance_matrix[tours[:, :-1], tours[:, 1:]]).sum(axis=1)
+
+    route.held_karp()
+
+    assert_improved_permutation(route, tour, distances.max())
+    assert route.fitness == pytest.approx(distances.min())
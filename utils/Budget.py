@@ -0,0 +1,44 @@
+import math
+import time
+
+
+class Budget:
+    """
+    Wall-clock time budget. It keeps an absolute deadline, so it can be sent to worker processes,
+    and it is split into smaller budgets for each individual and each phase of the solve.
+    A budget without seconds never expires.
+    """
+    def __init__(self, seconds=None, deadline=None):
+        if deadline is None:
+            deadline = math.inf if seconds is None or seconds <= 0 else time.time() + seconds
+        self.deadline = deadline
+
+
+    def remaining(self):
+        """
+        Seconds left until the deadline
+        """
+        return max(0.0, self.deadline - time.time())
+
+
+    def expired(self):
+        return time.time() >= self.deadline
+
+
+    def limit(self, seconds):
+        """
+        A time limit of a step bounded by the remaining time
+        """
+        return min(seconds, self.remaining())
+
+
+    def split(self, share, reserved=0.0, own=0.0):
+        """
+        New budget with a share (0..1) of the remaining time. 'reserved' seconds are put aside before sharing the
+        remaining time (e.g. the expected construction times of the individuals left) and 'own' of them are added
+        to the new budget
+        """
+        if math.isinf(self.deadline):
+            return Budget()
+        shared_time = max(0.0, self.remaining() - reserved) * share
+        return Budget(deadline=min(self.deadline, time.time() + own + shared_time))
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class DistanceMatrix:
+    """
+    Compact storage of a symmetric distance matrix with whole kilometers.
+    Distances are kept as uint16 (the longest geodesic is about 20004 km) and read back as float64,
+    so it can be indexed like the dense numpy matrix: [i, j], [i], [rows, columns], [np.ix_(rows, columns)]...
+
+    Storages:
+    integer -- Dense (N, N) uint16 array. 4 times smaller than float64
+    condensed -- Upper triangle as a (N * (N - 1) / 2) uint16 array, like scipy squareform. 8 times smaller than float64
+    """
+    def __init__(self, size, storage, data=None):
+        if storage not in ('integer', 'condensed'):
+            raise ValueError(f"Unknown distance matrix storage: {storage}")
+        self.size = size
+        self.storage = storage
+        self.shape = (size, size)
+        self.ndim = 2
+        self.dtype = np.dtype(np.float64)
+        if data is None:
+            data_shape = self.shape if storage == 'integer' else (size * (size - 1) // 2,)
+            data = np.zeros(data_shape, dtype=np.uint16)
+        self.data = data
+        # Position in the condensed upper triangle of the distance (i, j), i < j: row_offsets[i] + j
+        rows = np.arange(size, dtype=np.int64)
+        self.row_offsets = size * rows - rows * (rows + 1) // 2 - rows - 1 if storage == 'condensed' else None
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:, :].astype(dtype or self.dtype)
+
+
+    def __getitem__(self, key):
+        if self.storage == 'integer':
+            values = self.data[key]
+            return values.astype(self.dtype) if isinstance(values, np.ndarray) else self.dtype.type(values)
+
+        row_key, column_key = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(row_key, (int, np.integer)) and isinstance(column_key, (int, np.integer)):
+            # Single distance without building index arrays
+            first, second = sorted((int(row_key) % self.size, int(column_key) % self.size))
+            if first == second:
+                return self.dtype.type(0.0)
+            return self.dtype.type(self.data[self.row_offsets[first] + second])
+        rows = self.get_positions(row_key)
+        columns = self.get_positions(column_key)
+        if isinstance(row_key, slice) and isinstance(column_key, slice):
+            rows = rows[:, None]
+        elif isinstance(column_key, slice):
+            rows = np.expand_dims(rows, -1)
+        elif isinstance(row_key, slice):
+            rows = rows.reshape((-1,) + (1,) * np.ndim(columns))
+        values = self.lookup(rows, columns)
+        return values if isinstance(values, np.ndarray) and values.ndim > 0 else self.dtype.type(values)
+
+
+    def get_positions(self, key):
+        """
+        Non negative node positions selected by an index of one axis (integer, slice, integer array or boolean mask)
+        """
+        if isinstance(key, (int, np.integer)):
+            return int(key) + self.size if key < 0 else int(key)
+        if isinstance(key, slice):
+            return np.arange(*key.indices(self.size))
+        positions = np.asarray(key)
+        if positions.dtype == bool:
+            return np.flatnonzero(positions)
+        return positions + self.size * (positions < 0)
+
+
+    def lookup(self, rows, columns):
+        """
+        Distances between broadcastable arrays of row and column indices read from the condensed upper triangle
+        """
+        first = np.minimum(rows, columns)
+        second = np.maximum(rows, columns)
+        diagonal = first == second
+        index = self.row_offsets[first] + second
+        values = self.data[np.where(diagonal, 0, index)].astype(self.dtype)
+        return np.where(diagonal, 0.0, values)
+
+
+    def set_block(self, start, end, block):
+        """
+        Store the distances between rows start:end and columns start:N given as a dense (end - start, N - start) block
+        """
+        if self.storage == 'integer':
+            self.data[start:end, start:] = block
+            self.data[start:, start:end] = block.T
+            return
+        for row in range(start, end):
+            offset = self.row_offsets[row] + row + 1
+            self.data[offset:offset + self.size - row - 1] = block[row - start, row - start + 1:]
+
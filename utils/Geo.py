@@ -1,8 +1,14 @@
 import math
+import numpy as np
 from geopy.distance import geodesic
 
 
 class Geo:
+    # WGS-84 ellipsoid, the same one geopy uses for geodesic distances
+    WGS84_A = 6378137.0
+    WGS84_F = 1 / 298.257223563
+    EARTH_RADIUS_KM = 6371.0088
+
     def __init__(self):
         i = 0
 
@@ -11,6 +17,201 @@ class Geo:
         Calculates distance in kilometers"""
         return math.ceil(geodesic(coord1, coord2).kilometers)
 
+
+    def calculate_distance_matrix(self, coordinates_from, coordinates_to=None, mode='vincenty', block_size=512):
+        """
+        Calculates the distance matrix in kilometers between two arrays of (latitude, longitude) coordinates,
+        rounded up to whole kilometers exactly like calculate_distance.
+
+        Parameters:
+        coordinates_from -- Array (N, 2) with latitudes and longitudes
+        coordinates_to -- Array (M, 2) with latitudes and longitudes. If None the (N, N) matrix of coordinates_from is built
+        mode -- 'haversine' (spherical), 'vincenty' (batched ellipsoidal, Karney fallback) or 'geodesic' (geopy pair by pair)
+        block_size -- Number of rows evaluated at once, bounds the memory used by the vectorized modes
+
+        Output:
+            - distance_matrix
+        """
+        coordinates_from = np.asarray(coordinates_from, dtype=np.float64).reshape(-1, 2)
+        symmetric = coordinates_to is None
+        coordinates_to = coordinates_from if symmetric else np.asarray(coordinates_to, dtype=np.float64).reshape(-1, 2)
+
+        if mode == 'geodesic':
+            distance_matrix = np.zeros((len(coordinates_from), len(coordinates_to)))
+            for i, coord1 in enumerate(coordinates_from):
+                for j, coord2 in enumerate(coordinates_to):
+                    distance_matrix[i, j] = self.calculate_distance(tuple(coord1), tuple(coord2))
+            return distance_matrix
+        if mode not in ('haversine', 'vincenty'):
+            raise ValueError(f"Unknown distance mode: {mode}")
+
+        distance_matrix = np.zeros((len(coordinates_from), len(coordinates_to)))
+        for start in range(0, len(coordinates_from), block_size):
+            end = min(start + block_size, len(coordinates_from))
+            # Distances are symmetric, so only the upper triangle blocks are computed and then mirrored
+            column_start = start if symmetric else 0
+            block_from = coordinates_from[start:end]
+            block_to = coordinates_to[column_start:]
+            if mode == 'haversine':
+                block = self.haversine_distances(block_from[:, None, :], block_to[None, :, :])
+            else:
+                block = self.ellipsoidal_distances(block_from, block_to)
+            distance_matrix[start:end, column_start:] = np.ceil(block)
+            if symmetric:
+                distance_matrix[column_start:, start:end] = distance_matrix[start:end, column_start:].T
+        return distance_matrix
+
+
+    def haversine_distances(self, coordinates_from, coordinates_to):
+        """
+        Great circle distances in kilometers between broadcastable arrays of (latitude, longitude) coordinates
+        """
+        lat1, lon1 = np.radians(coordinates_from[..., 0]), np.radians(coordinates_from[..., 1])
+        lat2, lon2 = np.radians(coordinates_to[..., 0]), np.radians(coordinates_to[..., 1])
+        h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * self.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+    def project_coordinates(self, latitudes, longitudes, origin=None):
+        """
+        Equirectangular projection in kilometers of arrays of latitudes and longitudes around an origin (by default their mean).
+        Euclidean distances between the projected points approximate the geodesic ones at a country scale, so they
+        can be used by clustering algorithms instead of raw degrees.
+
+        Output:
+            - (N, 2) array of (x, y) kilometers
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if origin is None:
+            origin = (latitudes.mean(), longitudes.mean())
+        x = self.EARTH_RADIUS_KM * np.radians(longitudes - origin[1]) * np.cos(np.radians(origin[0]))
+        y = self.EARTH_RADIUS_KM * np.radians(latitudes - origin[0])
+        return np.column_stack((x, y))
+
+
+    def calculate_bearings(self, coordinates_from, coordinates_to):
+        """
+        Initial bearings in radians (0..2pi, clockwise from north) between broadcastable arrays of (latitude, longitude) coordinates
+        """
+        lat1, lon1 = np.radians(coordinates_from[..., 0]), np.radians(coordinates_from[..., 1])
+        lat2, lon2 = np.radians(coordinates_to[..., 0]), np.radians(coordinates_to[..., 1])
+        x = np.sin(lon2 - lon1) * np.cos(lat2)
+        y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+        return np.mod(np.arctan2(x, y), 2 * np.pi)
+
+
+    def lambert_distances(self, coordinates_from, coordinates_to):
+        """
+        Ellipsoidal distances in kilometers between every pair of two arrays of (latitude, longitude) coordinates
+        with the Andoyer-Lambert correction of the great circle distance. A few meters away from the exact geodesic
+        below 5000 km, and almost as cheap as the haversine formula because every trigonometric term except one
+        arcsin is computed per point instead of per pair.
+        """
+        f = self.WGS84_F
+        beta1 = np.arctan((1 - f) * np.tan(np.radians(coordinates_from[:, 0])))[:, None]
+        beta2 = np.arctan((1 - f) * np.tan(np.radians(coordinates_to[:, 0])))[None, :]
+        lon1 = np.radians(coordinates_from[:, 1])[:, None]
+        lon2 = np.radians(coordinates_to[:, 1])[None, :]
+        sin_beta1, cos_beta1 = np.sin(beta1), np.cos(beta1)
+        sin_beta2, cos_beta2 = np.sin(beta2), np.cos(beta2)
+
+        # h = sin^2(sigma / 2) of the central angle between the reduced latitudes
+        cos_delta_lon = np.cos(lon1) * np.cos(lon2) + np.sin(lon1) * np.sin(lon2)
+        cos_betas = cos_beta1 * cos_beta2
+        h = np.clip((1 - cos_betas - sin_beta1 * sin_beta2 + cos_betas * (1 - cos_delta_lon)) / 2, 0, 1)
+        sigma = 2 * np.arcsin(np.sqrt(h))
+        sin_sigma = 2 * np.sqrt(h * (1 - h))
+
+        # sin(P) cos(Q) and cos(P) sin(Q) with P, Q the half sum and half difference of the reduced latitudes
+        sin_P_cos_Q = (sin_beta1 + sin_beta2) / 2
+        cos_P_sin_Q = (sin_beta2 - sin_beta1) / 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            X = (sigma - sin_sigma) * sin_P_cos_Q ** 2 / (1 - h)
+            Y = (sigma + sin_sigma) * cos_P_sin_Q ** 2 / h
+            distances = self.WGS84_A * (sigma - f / 2 * (X + Y)) / 1000
+        return np.where(h == 0, 0.0, distances)
+
+
+    def ellipsoidal_distances(self, coordinates_from, coordinates_to, margin=0.02, max_lambert_distance=5000):
+        """
+        Ellipsoidal (WGS-84) distances in kilometers between every pair of two arrays of coordinates that give the
+        same whole kilometers as the exact geodesic. Every pair is approximated with lambert_distances and only the
+        pairs close to a kilometer boundary (or too long for the approximation) are solved with vincenty_distances.
+        """
+        distances = self.lambert_distances(coordinates_from, coordinates_to)
+        fraction = distances - np.floor(distances)
+        uncertain = (fraction < margin) | (fraction > 1 - margin) | (distances > max_lambert_distance) | ~np.isfinite(distances)
+        rows, columns = np.nonzero(uncertain)
+        distances[rows, columns] = self.vincenty_distances(coordinates_from[rows], coordinates_to[columns])
+        return distances
+
+
+    def vincenty_distances(self, coordinates_from, coordinates_to, max_iter=200, tolerance=1e-12):
+        """
+        Ellipsoidal (WGS-84) distances in kilometers between broadcastable arrays of (latitude, longitude) coordinates
+        using the Vincenty inverse formula evaluated on whole arrays. The few nearly antipodal pairs where Vincenty
+        does not converge are solved with the Karney algorithm of geopy.
+        """
+        a = self.WGS84_A
+        f = self.WGS84_F
+        b = (1 - f) * a
+        shape = np.broadcast_shapes(coordinates_from.shape, coordinates_to.shape)[:-1]
+        coordinates_from = np.broadcast_to(coordinates_from, shape + (2,)).reshape(-1, 2)
+        coordinates_to = np.broadcast_to(coordinates_to, shape + (2,)).reshape(-1, 2)
+
+        # Reduced latitudes only depend on each point, so they are computed once per row and column
+        U1 = np.arctan((1 - f) * np.tan(np.radians(coordinates_from[:, 0])))
+        U2 = np.arctan((1 - f) * np.tan(np.radians(coordinates_to[:, 0])))
+        sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+        sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+        L = np.radians(coordinates_to[:, 1] - coordinates_from[:, 1])
+
+        sin_sigma = np.zeros(len(L))
+        cos_sigma = np.zeros(len(L))
+        sigma = np.zeros(len(L))
+        cos_sq_alpha = np.zeros(len(L))
+        cos_2sigma_m = np.zeros(len(L))
+        converged = np.zeros(len(L), dtype=bool)
+
+        # Only the pairs that have not converged yet are iterated again
+        active = np.arange(len(L))
+        lambda_ = L.copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for _ in range(max_iter):
+                s_U1, c_U1, s_U2, c_U2 = sin_U1[active], cos_U1[active], sin_U2[active], cos_U2[active]
+                sin_lambda, cos_lambda = np.sin(lambda_), np.cos(lambda_)
+                s_sigma = np.sqrt((c_U2 * sin_lambda) ** 2 + (c_U1 * s_U2 - s_U1 * c_U2 * cos_lambda) ** 2)
+                c_sigma = s_U1 * s_U2 + c_U1 * c_U2 * cos_lambda
+                sig = np.arctan2(s_sigma, c_sigma)
+                sin_alpha = np.where(s_sigma == 0, 0.0, c_U1 * c_U2 * sin_lambda / s_sigma)
+                c_sq_alpha = 1 - sin_alpha ** 2
+                c_2sigma_m = np.where(c_sq_alpha == 0, 0.0, c_sigma - 2 * s_U1 * s_U2 / c_sq_alpha)
+                C = f / 16 * c_sq_alpha * (4 + f * (4 - 3 * c_sq_alpha))
+                lambda_previous = lambda_
+                lambda_ = L[active] + (1 - C) * f * sin_alpha * (sig + C * s_sigma * (c_2sigma_m + C * c_sigma * (-1 + 2 * c_2sigma_m ** 2)))
+
+                sin_sigma[active], cos_sigma[active], sigma[active] = s_sigma, c_sigma, sig
+                cos_sq_alpha[active], cos_2sigma_m[active] = c_sq_alpha, c_2sigma_m
+                done = np.abs(lambda_ - lambda_previous) < tolerance
+                converged[active[done]] = True
+                active = active[~done]
+                lambda_ = lambda_[~done]
+                if len(active) == 0:
+                    break
+
+        u_sq = cos_sq_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distances = b * A * (sigma - delta_sigma) / 1000
+
+        # Karney fallback for the pairs where the Vincenty iteration did not converge
+        for index in np.nonzero(~converged | ~np.isfinite(distances))[0]:
+            distances[index] = geodesic(tuple(coordinates_from[index]), tuple(coordinates_to[index])).kilometers
+        return distances.reshape(shape)
+
+
     def signed_polygon_area(self, vertices):
         """Calcula el area de un poligono utilizando su lista de vertices."""
         num_vertices = len(vertices)
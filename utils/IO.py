@@ -24,6 +24,29 @@ class IO:
             output_df.to_excel(file_name + '.xlsx') 
 
 
+    def create_csv_if_changed(self, output_df, file_name):
+        """
+        Creates the CSV of a dataframe only if the file does not exist or its content is different,
+        so an unchanged file is not rewritten in every run
+
+        Output:
+        True if the file was written
+        """
+        try:
+            content = output_df.to_csv(sep=';', index=False, columns=output_df.columns, decimal=',').encode('latin-1')
+        except UnicodeEncodeError:
+            self.create_csv(output_df, file_name)
+            return True
+        file_path = file_name + '.csv'
+        if os.path.exists(file_path) and os.path.getsize(file_path) == len(content):
+            with open(file_path, 'rb') as csv_file:
+                if csv_file.read() == content:
+                    return False
+        with open(file_path, 'wb') as csv_file:
+            csv_file.write(content)
+        return True
+
+
     def create_CSV_from_list(self, list_of_objects, columns_name, file_name):
         """Crea un archivo CSV usando a partir de una lista de objetos usando pandas. Utiliza ';' como separador.
 
@@ -0,0 +1,141 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+class InstanceSnapshot:
+    """
+    Binary snapshot of a built instance: node and fleet columns, distance matrix and candidate lists, stored as one
+    .npy file per array in a folder named after the hash of the input files and the parameters used to build them.
+    Numeric columns keep their dtype, text columns are fixed width unicode arrays (with a mask of the missing values),
+    columns of mixed types are a JSON list and nothing is pickled. The distance matrix is loaded as a read only memory map, so loading an instance does not parse any CSV.
+    """
+    def __init__(self, snapshot_path, max_entries=3):
+        self.snapshot_path = snapshot_path
+        self.max_entries = max_entries
+        os.makedirs(self.snapshot_path, exist_ok=True)
+
+
+    def create_key(self, file_paths, settings):
+        """
+        Fingerprint of the content of the input files and the settings that change the instance built from them
+        """
+        key = hashlib.sha1()
+        for file_path in file_paths:
+            with open(file_path, 'rb') as input_file:
+                key.update(hashlib.sha1(input_file.read()).digest())
+        key.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return key.hexdigest()
+
+
+    def get_folder(self, key):
+        return os.path.join(self.snapshot_path, key)
+
+
+    def load(self, key):
+        """
+        Load the snapshot of a given key
+
+        Output:
+            - Dictionary with 'nodes_df', 'fleet_df', 'distance_matrix' (data of the matrix storage) and
+              'candidates' (k -> candidate array), or None if there is no snapshot
+        """
+        folder = self.get_folder(key)
+        schema_file = os.path.join(folder, 'schema.json')
+        if not os.path.exists(schema_file):
+            return None
+        try:
+            with open(schema_file, 'r', encoding='utf-8') as file:
+                schema = json.load(file)
+            return {
+                'nodes_df': self.load_dataframe(folder, 'nodes', schema['nodes']),
+                'fleet_df': self.load_dataframe(folder, 'fleet', schema['fleet']),
+                'distance_matrix': np.load(os.path.join(folder, 'distance_matrix.npy'), mmap_mode='r', allow_pickle=False),
+                'candidates': {int(k): np.load(os.path.join(folder, 'candidates_' + str(k) + '.npy'), allow_pickle=False) for k in schema['candidates']},
+            }
+        except (ValueError, OSError, KeyError) as ex:
+            print("ERROR al leer el snapshot de la instancia, se vuelve a crear...", ex)
+            return None
+
+
+    def save(self, key, nodes_df, fleet_df, distance_matrix, candidates):
+        """
+        Store a snapshot under a given key. It is written in a temporary folder and renamed when complete,
+        so an interrupted run never leaves a broken snapshot.
+        """
+        folder = self.get_folder(key)
+        temporary_folder = folder + '.tmp'
+        shutil.rmtree(temporary_folder, ignore_errors=True)
+        os.makedirs(temporary_folder)
+        schema = {
+            'nodes': self.save_dataframe(temporary_folder, 'nodes', nodes_df),
+            'fleet': self.save_dataframe(temporary_folder, 'fleet', fleet_df),
+            'candidates': sorted(int(k) for k in candidates),
+        }
+        np.save(os.path.join(temporary_folder, 'distance_matrix.npy'), np.asarray(distance_matrix))
+        for k, candidate_array in candidates.items():
+            np.save(os.path.join(temporary_folder, 'candidates_' + str(k) + '.npy'), np.ascontiguousarray(candidate_array))
+        with open(os.path.join(temporary_folder, 'schema.json'), 'w', encoding='utf-8') as file:
+            json.dump(schema, file)
+
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(temporary_folder, folder)
+        self.remove_old_entries()
+
+
+    def save_dataframe(self, folder, name, dataframe):
+        """
+        Save every column of a dataframe in its own .npy file
+
+        Output:
+            - List of (column, kind) of the saved columns: 'numeric', 'text' or 'object' (mixed types)
+        """
+        columns = list()
+        for position, column in enumerate(dataframe.columns):
+            values = dataframe[column]
+            file_name = os.path.join(folder, name + '_' + str(position))
+            if pd.api.types.is_numeric_dtype(values):
+                kind = 'numeric'
+                np.save(file_name + '.npy', values.to_numpy())
+            elif values.dropna().map(type).eq(str).all():
+                kind = 'text'
+                missing = values.isna().to_numpy()
+                np.save(file_name + '.npy', values.fillna('').to_numpy(dtype=str))
+                np.save(file_name + '_missing.npy', missing)
+            else:
+                kind = 'object'
+                with open(file_name + '.json', 'w', encoding='utf-8') as file:
+                    json.dump(values.tolist(), file)
+            columns.append((column, kind))
+        return columns
+
+
+    def load_dataframe(self, folder, name, columns):
+        """
+        Rebuild a dataframe saved with save_dataframe
+        """
+        data = dict()
+        for position, (column, kind) in enumerate(columns):
+            file_name = os.path.join(folder, name + '_' + str(position))
+            if kind == 'numeric':
+                data[column] = np.load(file_name + '.npy', allow_pickle=False)
+            elif kind == 'text':
+                values = pd.Series(np.load(file_name + '.npy', allow_pickle=False), dtype=str)
+                data[column] = values.mask(np.load(file_name + '_missing.npy', allow_pickle=False))
+            else:
+                with open(file_name + '.json', 'r', encoding='utf-8') as file:
+                    data[column] = pd.Series(json.load(file), dtype=object)
+        return pd.DataFrame(data)
+
+
+    def remove_old_entries(self):
+        """
+        Keep only the newest max_entries snapshots
+        """
+        folders = [folder for folder in glob.glob(os.path.join(self.snapshot_path, '*')) if os.path.isdir(folder) and not folder.endswith('.tmp')]
+        for folder in sorted(folders, key=os.path.getmtime, reverse=True)[self.max_entries:]:
+            shutil.rmtree(folder, ignore_errors=True)
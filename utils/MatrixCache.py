@@ -0,0 +1,108 @@
+import os
+import glob
+import hashlib
+import tempfile
+import numpy as np
+
+
+class MatrixCache:
+    def __init__(self, cache_path, max_entries=5):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        os.makedirs(self.cache_path, exist_ok=True)
+
+
+    def create_key(self, coordinates, mode):
+        """
+        Fingerprint of the ordered (latitude, longitude) array and the distance mode
+        """
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        return mode + '_' + hashlib.sha1(coordinates.tobytes()).hexdigest()
+
+
+    def get_matrix_file(self, key):
+        """
+        Path of the .npy file that stores the matrix of a given key
+        """
+        return os.path.join(self.cache_path, 'distance_matrix_' + key + '.npy')
+
+
+    def get_coordinates_file(self, key):
+        """
+        Path of the .npy file that stores the coordinates used to build the matrix of a given key
+        """
+        return os.path.join(self.cache_path, 'coordinates_' + key + '.npy')
+
+
+    def load(self, key):
+        """
+        Load the matrix of a given key as a read only memory map (zero-copy). Returns None if it is not cached.
+        """
+        matrix_file = self.get_matrix_file(key)
+        if not os.path.exists(matrix_file):
+            return None
+        try:
+            matrix = np.load(matrix_file, mmap_mode='r')
+            # A hit refreshes the modification time, so remove_old_entries evicts the least recently used matrices
+            os.utime(matrix_file)
+            return matrix
+        except (ValueError, OSError) as ex:
+            print("ERROR al leer la matriz cacheada, se vuelve a calcular...", ex)
+            return None
+
+
+    def save(self, key, matrix, coordinates):
+        """
+        Store the matrix and its coordinates under a given key and remove the oldest entries
+        """
+        self.save_array(self.get_coordinates_file(key), np.ascontiguousarray(coordinates, dtype=np.float64))
+        self.save_array(self.get_matrix_file(key), matrix)
+        self.remove_old_entries()
+
+
+    def save_array(self, file_name, array):
+        """
+        Write an array into a .npy file through a temporary file with a unique name, so an interrupted run never leaves
+        a broken cache and processes writing the same key do not write into the same file
+        """
+        with tempfile.NamedTemporaryFile(dir=self.cache_path, suffix='.tmp', delete=False) as file:
+            np.save(file, array)
+        os.replace(file.name, file_name)
+
+
+    def find_closest_entry(self, coordinates, mode):
+        """
+        Look for the cached entry with the same distance mode that shares most coordinates with the given ones.
+
+        Output:
+            - (matrix, cached_coordinates) or (None, None) if no entry shares coordinates
+        """
+        coordinates_set = set(map(tuple, np.asarray(coordinates, dtype=np.float64)))
+        best_key, best_overlap = None, 0
+        for coordinates_file in glob.glob(os.path.join(self.cache_path, 'coordinates_' + mode + '_*.npy')):
+            key = os.path.basename(coordinates_file)[len('coordinates_'):-len('.npy')]
+            if not os.path.exists(self.get_matrix_file(key)):
+                continue
+            cached_coordinates = np.load(coordinates_file)
+            overlap = len(coordinates_set.intersection(map(tuple, cached_coordinates)))
+            if overlap > best_overlap:
+                best_key, best_overlap = key, overlap
+
+        if best_key is None:
+            return None, None
+        matrix = self.load(best_key)
+        if matrix is None:
+            return None, None
+        return matrix, np.load(self.get_coordinates_file(best_key))
+
+
+    def remove_old_entries(self):
+        """
+        Keep only the newest max_entries matrices in the cache folder
+        """
+        matrix_files = sorted(glob.glob(os.path.join(self.cache_path, 'distance_matrix_*.npy')), key=os.path.getmtime, reverse=True)
+        for matrix_file in matrix_files[self.max_entries:]:
+            key = os.path.basename(matrix_file)[len('distance_matrix_'):-len('.npy')]
+            for file_name in (matrix_file, self.get_coordinates_file(key)):
+                if os.path.exists(file_name):
+                    os.remove(file_name)
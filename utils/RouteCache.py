@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class RouteCache:
+    """
+    LRU cache of optimised tours keyed by the set of customers of the route.
+    Every route starts and ends at the same depot and the distances are symmetric, so the best tour
+    found for a set of customers is valid for any vehicle that serves the same set.
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # frozenset of customers -> (tour, fitness)
+        self.hits = 0
+        self.misses = 0
+        # Changes not yet sent to another cache with get_updates (worker processes send them to the parent)
+        self.updated_keys = set()
+        self.reported_hits = 0
+        self.reported_misses = 0
+
+
+    def create_key(self, tour):
+        """
+        Key of a tour: the customers without the depot
+        """
+        return frozenset(np.asarray(tour[1:-1]).tolist())
+
+
+    def get(self, tour):
+        """
+        Best known (tour, fitness) for the customers of a tour, or None
+        """
+        if self.max_entries <= 0:
+            return None
+        key = self.create_key(tour)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0].copy(), entry[1]
+
+
+    def put(self, tour, fitness):
+        """
+        Store an optimised tour unless a better one is already known for the same customers
+        """
+        if self.max_entries <= 0:
+            return
+        key = self.create_key(tour)
+        if self.store(key, tour, fitness):
+            self.updated_keys.add(key)
+
+
+    def store(self, key, tour, fitness):
+        """
+        Store a tour under a key unless a better one is already known. Returns True if the entry changed
+        """
+        entry = self.entries.get(key)
+        changed = entry is None or fitness < entry[1]
+        if changed:
+            self.entries[key] = (np.array(tour, copy=True), fitness)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return changed
+
+
+    def get_entries(self):
+        """
+        Every entry as (key, tour, fitness), to be merged into the cache of a worker process
+        """
+        return [(key, tour, fitness) for key, (tour, fitness) in self.entries.items()]
+
+
+    def get_updates(self):
+        """
+        Entries stored and lookups made since the last call, to be merged into the cache of the parent process
+
+        Output:
+            - (entries, hits, misses)
+        """
+        entries = [(key, *self.entries[key]) for key in self.updated_keys if key in self.entries]
+        updates = (entries, self.hits - self.reported_hits, self.misses - self.reported_misses)
+        self.updated_keys = set()
+        self.reported_hits = self.hits
+        self.reported_misses = self.misses
+        return updates
+
+
+    def merge(self, entries, hits=0, misses=0):
+        """
+        Add the entries and the lookup counts of another cache
+        """
+        if self.max_entries > 0:
+            for key, tour, fitness in entries:
+                self.store(key, tour, fitness)
+        self.hits += hits
+        self.misses += misses
+
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+    def __str__(self) -> str:
+        return 'Route cache entries: ' + str(len(self.entries)) + ' Hits: ' + str(self.hits) + ' Misses: ' + str(self.misses) + ' Hit rate: ' + str(round(self.hit_rate() * 100, 2)) + '%'
@@ -0,0 +1,53 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedArrays:
+    """
+    Numpy arrays published in shared memory blocks, so worker processes map them instead of receiving a pickled copy.
+    The process that shares the arrays owns the blocks and must release them with unlink=True.
+    """
+    def __init__(self):
+        self.blocks = dict()
+        self.descriptors = dict() # name -> (block name, shape, dtype)
+
+
+    def share(self, name, array):
+        """
+        Copy an array into a new shared memory block and return the shared view of it
+        """
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared_array[...] = array
+        self.blocks[name] = block
+        self.descriptors[name] = (block.name, array.shape, array.dtype.str)
+        return shared_array
+
+
+    def attach(self, descriptors):
+        """
+        Map the blocks described by the descriptors of another SharedArrays object
+
+        Output:
+            - Dictionary name -> array
+        """
+        arrays = dict()
+        for name, (block_name, shape, dtype) in descriptors.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            self.blocks[name] = block
+            self.descriptors[name] = (block_name, shape, dtype)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        return arrays
+
+
+    def release(self, unlink=False):
+        """
+        Close the blocks and, in the owner process, free them
+        """
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks = dict()
+        self.descriptors = dict()
@@ -5,4 +5,10 @@ from .Here import Here
 from .IO import IO
 from .Polygon import Polygon
 from .DataGraph import DataGraph
-from .TimeWindow import TimeWindow
\ No newline at end of file
+from .TimeWindow import TimeWindow
+from .MatrixCache import MatrixCache
+from .DistanceMatrix import DistanceMatrix
+from .SharedArrays import SharedArrays
+from .Budget import Budget
+from .RouteCache import RouteCache
+from .InstanceSnapshot import InstanceSnapshot
\ No newline at end of file